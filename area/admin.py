@@ -3,7 +3,9 @@
 from django.contrib import admin
 from django.contrib.gis.admin import OSMGeoAdmin
 
-from area.models import City, Continent, Country, Region
+from area.managers import normalize_name
+from area.models import City, CityAlternateName, Continent, Country, PostalCode, Region
+from common.paginator import EstimatedCountPaginator
 
 
 # Register your models here.
@@ -21,6 +23,8 @@ class ContinentAdmin(admin.ModelAdmin):
 class CountryAdmin(admin.ModelAdmin):
 	list_display = ('code', 'code3', 'name', 'continent', 'tld',)
 	list_display_links = None
+	list_select_related = ('continent',)
+	search_fields = ('name', '=code', '=code3')
 
 	def has_add_permission(self, request):
 		return False
@@ -30,6 +34,9 @@ class CountryAdmin(admin.ModelAdmin):
 class RegionAdmin(admin.ModelAdmin):
 	list_display = ('code', 'name', 'asciiName', 'country')
 	list_display_links = None
+	list_select_related = ('country',)
+	search_fields = ('name', 'asciiName', '=code')
+	autocomplete_fields = ('country',)
 
 	def has_add_permission(self, request):
 		return False
@@ -39,6 +46,38 @@ class RegionAdmin(admin.ModelAdmin):
 class CityAdmin(OSMGeoAdmin):
 	list_display = ('name', 'asciiName', 'country', 'region', 'location')
 	list_display_links = ('name',)
+	list_select_related = ('country', 'region')
+	# Ordering by name would sort the whole table once the admin adds its primary key tie breaker
+	ordering = ('pk',)
+	autocomplete_fields = ('country', 'region')
+	search_fields = ('name',)
+	paginator = EstimatedCountPaginator
+	show_full_result_count = False
+
+	def has_add_permission(self, request):
+		return False
+
+	def get_search_results(self, request, queryset, search_term):
+		"""Match the beginning of any alternate name through its prefix index, or a geoname id"""
+		if not search_term:
+			return queryset, False
+		if search_term.isdigit():
+			return queryset.filter(pk=search_term), False
+
+		city_ids = CityAlternateName.objects.filter(normalized__startswith=normalize_name(search_term)).values(
+				'city_id')
+		return queryset.filter(pk__in=city_ids), False
+
+
+@admin.register(PostalCode)
+class PostalCodeAdmin(admin.ModelAdmin):
+	list_display = ('postal_code', 'name', 'country', 'region')
+	list_display_links = None
+	list_select_related = ('country', 'region')
+	ordering = ('pk',)
+	raw_id_fields = ('country', 'region')
+	paginator = EstimatedCountPaginator
+	show_full_result_count = False
 
 	def has_add_permission(self, request):
 		return False
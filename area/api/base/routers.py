@@ -0,0 +1,12 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+from rest_framework import routers
+
+from area.api.base.views import AutocompleteViewSet, NearbyViewSet, PostalCodeViewSet, ReverseGeocodeViewSet
+
+router = routers.DefaultRouter()
+router.register(r'autocomplete', AutocompleteViewSet, basename='autocomplete')
+router.register(r'reverse-geocode', ReverseGeocodeViewSet, basename='reverse-geocode')
+router.register(r'nearby', NearbyViewSet, basename='nearby')
+router.register(r'postal-code', PostalCodeViewSet, basename='postal-code')
+
+api_urlpatterns = router.urls
@@ -0,0 +1,87 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+from rest_framework import serializers
+
+from area.enums import AreaKindEnum
+from area.models import City, Country, PostalCode, Region
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+	q = serializers.CharField(max_length=200, trim_whitespace=True)
+	kind = serializers.ChoiceField(choices=AreaKindEnum.choices(), required=False)
+	limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class AutocompleteSerializer(serializers.Serializer):
+	kind = serializers.CharField()
+	id = serializers.IntegerField(source='object_id')
+	name = serializers.CharField()
+	label = serializers.CharField()
+	population = serializers.IntegerField()
+
+
+class CountrySerializer(serializers.ModelSerializer):
+	class Meta:
+		model = Country
+		fields = ['id', 'name', 'code', 'code3']
+
+
+class RegionSerializer(serializers.ModelSerializer):
+	class Meta:
+		model = Region
+		fields = ['id', 'name', 'code']
+
+
+class CitySerializer(serializers.ModelSerializer):
+	latitude = serializers.FloatField(source='location.y', read_only=True)
+	longitude = serializers.FloatField(source='location.x', read_only=True)
+	region = RegionSerializer(read_only=True)
+	country = CountrySerializer(read_only=True)
+
+	class Meta:
+		model = City
+		fields = ['id', 'name', 'asciiName', 'latitude', 'longitude', 'population', 'timezone', 'region', 'country']
+
+
+class ReverseGeocodeQuerySerializer(serializers.Serializer):
+	lat = serializers.FloatField(min_value=-90, max_value=90)
+	lon = serializers.FloatField(min_value=-180, max_value=180)
+	radius = serializers.FloatField(min_value=0, max_value=500, default=50)
+
+
+class ReverseGeocodeSerializer(CitySerializer):
+	distance = serializers.SerializerMethodField()
+
+	class Meta(CitySerializer.Meta):
+		fields = CitySerializer.Meta.fields + ['distance']
+
+	def get_distance(self, obj):
+		return round(obj.distance.km, 3)
+
+
+class NearbyQuerySerializer(ReverseGeocodeQuerySerializer):
+	radius = serializers.FloatField(min_value=0, max_value=500)
+	min_population = serializers.IntegerField(min_value=0, required=False)
+	limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+	group = serializers.ChoiceField(choices=['region'], required=False)
+
+
+class NearbyRegionSerializer(serializers.Serializer):
+	region = RegionSerializer()
+	country = CountrySerializer()
+	cities = ReverseGeocodeSerializer(many=True)
+
+
+class PostalCodeQuerySerializer(serializers.Serializer):
+	country = serializers.CharField(min_length=2, max_length=2)
+	postal_code = serializers.CharField(max_length=20, trim_whitespace=True)
+
+
+class PostalCodeSerializer(serializers.ModelSerializer):
+	latitude = serializers.FloatField(source='location.y', read_only=True, default=None)
+	longitude = serializers.FloatField(source='location.x', read_only=True, default=None)
+	region = RegionSerializer(read_only=True)
+	country = CountrySerializer(read_only=True)
+
+	class Meta:
+		model = PostalCode
+		fields = ['postal_code', 'name', 'latitude', 'longitude', 'accuracy', 'region', 'country']
@@ -0,0 +1,105 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import hashlib
+
+from rest_framework import permissions, status, viewsets
+from rest_framework.response import Response
+
+from area.api.base.serializers import AutocompleteQuerySerializer, AutocompleteSerializer, NearbyQuerySerializer, \
+	NearbyRegionSerializer, PostalCodeQuerySerializer, PostalCodeSerializer, ReverseGeocodeQuerySerializer, \
+	ReverseGeocodeSerializer
+from area.autocomplete import autocomplete
+from area.cache import get_dataset_version
+from area.models import City, PostalCode
+from area.registry import registry
+
+
+# Create your views here.
+class AutocompleteViewSet(viewsets.ViewSet):
+	"""
+	Country, region and city names starting with ``q``, most populous first.
+
+	Responses carry an ``ETag`` derived from the area dataset version, so clients revalidating an unchanged result
+	get an empty ``304 Not Modified``.
+	"""
+	permission_classes = [permissions.AllowAny]
+	throttle_classes = []
+
+	def list(self, request, *args, **kwargs):
+		query = AutocompleteQuerySerializer(data=request.query_params)
+		query.is_valid(raise_exception=True)
+		params = query.validated_data
+
+		etag = '"%s"' % hashlib.md5('{}:{}:{}:{}'.format(get_dataset_version(), params['q'], params.get('kind'),
+		                                                   params['limit']).encode('utf-8')).hexdigest()
+		if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+			return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+		results = autocomplete(params['q'], kind=params.get('kind'), limit=params['limit'])
+		return Response(AutocompleteSerializer(results, many=True).data, headers={'ETag': etag})
+
+
+class ReverseGeocodeViewSet(viewsets.ViewSet):
+	"""Nearest city to ``lat``/``lon`` within ``radius`` km, with its region and country"""
+	permission_classes = [permissions.AllowAny]
+	throttle_classes = []
+
+	def list(self, request, *args, **kwargs):
+		query = ReverseGeocodeQuerySerializer(data=request.query_params)
+		query.is_valid(raise_exception=True)
+		params = query.validated_data
+
+		city = City.objects.nearest(latitude=params['lat'], longitude=params['lon'], radius=params['radius'])
+		if city is None:
+			return Response(status=status.HTTP_404_NOT_FOUND)
+
+		return Response(ReverseGeocodeSerializer(city).data)
+
+
+class NearbyViewSet(viewsets.ViewSet):
+	"""
+	Cities within ``radius`` km of ``lat``/``lon``, nearest first, optionally above ``min_population``.
+
+	With ``group=region`` the cities are grouped under their region, regions ordered by their nearest city.
+	"""
+	permission_classes = [permissions.AllowAny]
+	throttle_classes = []
+
+	def list(self, request, *args, **kwargs):
+		query = NearbyQuerySerializer(data=request.query_params)
+		query.is_valid(raise_exception=True)
+		params = query.validated_data
+
+		cities = City.objects.within(latitude=params['lat'], longitude=params['lon'], radius=params['radius'],
+		                             min_population=params.get('min_population'))[:params['limit']]
+
+		if params.get('group') != 'region':
+			return Response(ReverseGeocodeSerializer(cities, many=True).data)
+
+		groups = {}
+		for city in cities:
+			group = groups.setdefault(city.region_id, {'region': city.region, 'country': city.country, 'cities': []})
+			group['cities'].append(city)
+
+		return Response(NearbyRegionSerializer(groups.values(), many=True).data)
+
+
+class PostalCodeViewSet(viewsets.ViewSet):
+	"""Places served by ``postal_code`` in the country with the ISO code ``country``, with their coordinates"""
+	permission_classes = [permissions.AllowAny]
+	throttle_classes = []
+
+	def list(self, request, *args, **kwargs):
+		query = PostalCodeQuerySerializer(data=request.query_params)
+		query.is_valid(raise_exception=True)
+		params = query.validated_data
+
+		country = registry.country_by_code(params['country'].upper())
+		if country is None:
+			return Response(status=status.HTTP_404_NOT_FOUND)
+
+		postal_codes = list(PostalCode.objects.select_related('region', 'country').filter(
+				country_id=country.pk, postal_code=params['postal_code'].upper()))
+		if not postal_codes:
+			return Response(status=status.HTTP_404_NOT_FOUND)
+
+		return Response(PostalCodeSerializer(postal_codes, many=True).data)
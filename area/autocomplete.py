@@ -0,0 +1,93 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+import logging
+from functools import lru_cache
+
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from area.cache import get_dataset_version
+from area.enums import AreaKindEnum
+from area.managers import normalize_name
+from area.models import AutocompleteEntry, City, CityAlternateName, Country, Region
+
+logger = logging.getLogger(__name__)
+
+PREFIX_LENGTH = 3
+CACHE_SIZE = 8192
+
+
+def rebuild_autocomplete_index(batch_size=1000):
+	"""
+	Rebuild the autocomplete index from the area tables in one transaction.
+
+	Countries and regions are ranked by the population of their cities. City names come from the already normalized
+	alternate names and are copied with a single ``INSERT ... SELECT`` instead of being loaded into Python.
+	"""
+	with transaction.atomic():
+		AutocompleteEntry.objects.all().delete()
+
+		entries = []
+		for country in Country.objects.annotate(population=Sum('cities__population')).iterator():
+			entries.append(_entry(AreaKindEnum.country.name, country.pk, country.name, country.name,
+			                      country.population))
+
+		for region in Region.objects.select_related('country').annotate(
+				population=Sum('cities__population')).iterator():
+			label = ', '.join([str(region), region.country.name])
+			entries.append(_entry(AreaKindEnum.region.name, region.pk, str(region), label, region.population))
+
+		AutocompleteEntry.objects.bulk_create([e for e in entries if e.normalized], batch_size=batch_size)
+
+		with connection.cursor() as cursor:
+			cursor.execute(
+					"""
+					INSERT INTO {entry} (kind, object_id, name, label, normalized, prefix, population)
+					SELECT %s, city.id, city.name,
+					       CONCAT_WS(', ', city.name, region.name, country.name),
+					       alternate.normalized, LEFT(alternate.normalized, %s), city.population
+					FROM {alternate} alternate
+					JOIN {city} city ON city.id = alternate.city_id
+					JOIN {country} country ON country.id = city.country_id
+					LEFT JOIN {region} region ON region.id = city.region_id
+					""".format(entry=AutocompleteEntry._meta.db_table, alternate=CityAlternateName._meta.db_table,
+					           city=City._meta.db_table, country=Country._meta.db_table,
+					           region=Region._meta.db_table),
+					[AreaKindEnum.city.name, PREFIX_LENGTH]
+			)
+
+	_autocomplete.cache_clear()
+	logger.info("Rebuilt autocomplete index with %d entries", AutocompleteEntry.objects.count())
+
+
+def _entry(kind, object_id, name, label, population):
+	normalized = normalize_name(name)[:200]
+	return AutocompleteEntry(kind=kind, object_id=object_id, name=name, label=label, normalized=normalized,
+	                         prefix=normalized[:PREFIX_LENGTH], population=population or 0)
+
+
+def autocomplete(query, kind=None, limit=10):
+	"""Best matches for the beginning of a country, region or city name, most populous first"""
+	normalized = normalize_name(query)
+	if not normalized:
+		return ()
+
+	return _autocomplete(get_dataset_version(), normalized, kind, limit)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _autocomplete(version, normalized, kind, limit):
+	if len(normalized) < PREFIX_LENGTH:
+		# Served by the varchar_pattern_ops index. Only a few hundred such queries exist and they stay in the LRU.
+		queryset = AutocompleteEntry.objects.filter(prefix__startswith=normalized)
+	else:
+		queryset = AutocompleteEntry.objects.filter(prefix=normalized[:PREFIX_LENGTH])
+		if len(normalized) > PREFIX_LENGTH:
+			queryset = queryset.filter(normalized__startswith=normalized)
+	if kind is not None:
+		queryset = queryset.filter(kind=kind)
+
+	# A city matching through several of its alternate names must only be listed once. Its entries only differ in
+	# the normalized name, so SELECT DISTINCT over the returned columns keeps one row per city.
+	queryset = queryset.values('kind', 'object_id', 'name', 'label', 'population').distinct()
+	return tuple(queryset.order_by('-population', 'kind', 'object_id')[:limit])
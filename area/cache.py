@@ -0,0 +1,34 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+import time
+
+from area.models import DatasetVersion
+
+REFRESH_INTERVAL = 1.0
+
+_current = {'version': None, 'checked_at': 0.0}
+
+
+def get_dataset_version(refresh=False):
+	"""
+	Version of the area data, shared by all processes through a row in the database.
+
+	Derived caches key their entries on this value so a bump after an import invalidates them everywhere. Each
+	process re-reads the row at most every ``REFRESH_INTERVAL`` seconds, or right away with ``refresh``, so the
+	other processes follow a bump within that delay.
+	"""
+	now = time.monotonic()
+	if refresh or _current['version'] is None or now - _current['checked_at'] > REFRESH_INTERVAL:
+		version = DatasetVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+		if version is None:
+			row, _ = DatasetVersion.objects.get_or_create(pk=1, defaults={'version': int(time.time() * 1000)})
+			version = row.version
+		_current.update(version=version, checked_at=now)
+	return _current['version']
+
+
+def bump_dataset_version():
+	version = max(int(time.time() * 1000), get_dataset_version(refresh=True) + 1)
+	DatasetVersion.objects.update_or_create(pk=1, defaults={'version': version})
+	_current.update(version=version, checked_at=time.monotonic())
+	return version
@@ -17,3 +17,9 @@ class ContinentEnum(ChoiceEnum):
 	OC = 'Oceania'
 	SA = 'South America'
 	AN = 'Antartica'
+
+
+class AreaKindEnum(ChoiceEnum):
+	country = 'Country'
+	region = 'Region'
+	city = 'City'
@@ -0,0 +1,110 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+import logging
+import os
+
+import numpy as np
+from django.conf import settings as django_settings
+from django.db.models import FloatField, Func
+from scipy.spatial import cKDTree
+
+from area.models import City
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_unit_vectors(latitudes, longitudes):
+	"""Project coordinates in degrees onto the unit sphere, where chord length grows with great-circle distance"""
+	latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+	longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+	cos_latitudes = np.cos(latitudes)
+
+	return np.ascontiguousarray(np.stack([cos_latitudes * np.cos(longitudes), cos_latitudes * np.sin(longitudes),
+	                                      np.sin(latitudes)], axis=-1))
+
+
+class ReverseGeocoder(object):
+	"""
+	In-memory nearest city lookup for batch jobs.
+
+	City ids and unit vector coordinates are stored as ``.npy`` files in the geonames data directory. ``load`` maps
+	them read-only, so every process using the geocoder shares the same pages, and builds a KD-tree over the mapped
+	coordinates without copying them. ``nearest`` answers whole arrays of points in one vectorized call.
+	"""
+	ids_file = 'geocoder_ids.npy'
+	points_file = 'geocoder_points.npy'
+
+	def __init__(self, ids, points):
+		self.ids = ids
+		self.points = points
+		self.tree = cKDTree(points, copy_data=False) if len(ids) else None
+
+	@classmethod
+	def default_data_dir(cls):
+		return os.path.join(django_settings.MEDIA_ROOT, 'geoname')
+
+	@classmethod
+	def build(cls, data_dir=None):
+		"""
+		Dump every located city into the data directory, replacing the previous files atomically.
+
+		Nothing is loaded here; each process maps the files with ``load`` when it needs them.
+		"""
+		data_dir = data_dir or cls.default_data_dir()
+		if not os.path.exists(data_dir):
+			os.makedirs(data_dir)
+
+		rows = City.objects.exclude(location=None).annotate(
+				lon=Func('location', function='ST_X', output_field=FloatField()),
+				lat=Func('location', function='ST_Y', output_field=FloatField())
+		).order_by().values_list('id', 'lat', 'lon')
+
+		ids, latitudes, longitudes = [], [], []
+		for city_id, latitude, longitude in rows.iterator():
+			ids.append(city_id)
+			latitudes.append(latitude)
+			longitudes.append(longitude)
+
+		for file_name, array in ((cls.ids_file, np.array(ids, dtype=np.int64)),
+		                         (cls.points_file, to_unit_vectors(latitudes, longitudes))):
+			tmp_path = os.path.join(data_dir, file_name + '.tmp')
+			with open(tmp_path, 'wb') as file_obj:
+				np.save(file_obj, array)
+			os.replace(tmp_path, os.path.join(data_dir, file_name))
+
+		logger.info("Built reverse geocoder with %d cities", len(ids))
+
+	@classmethod
+	def load(cls, data_dir=None):
+		data_dir = data_dir or cls.default_data_dir()
+		ids = np.load(os.path.join(data_dir, cls.ids_file), mmap_mode='r')
+		points = np.load(os.path.join(data_dir, cls.points_file), mmap_mode='r')
+
+		return cls(ids=ids, points=points)
+
+	def nearest(self, latitudes, longitudes, max_distance=None):
+		"""
+		Ids of the cities nearest to each point and their great-circle distance in km.
+
+		Points without a city within ``max_distance`` km get the id ``-1`` and an infinite distance.
+		"""
+		latitudes = np.atleast_1d(latitudes)
+		longitudes = np.atleast_1d(longitudes)
+		if self.tree is None:
+			return np.full(latitudes.shape, -1, dtype=np.int64), np.full(latitudes.shape, np.inf)
+
+		upper_bound = np.inf
+		if max_distance is not None:
+			upper_bound = 2 * np.sin(min(max_distance / EARTH_RADIUS_KM, np.pi) / 2)
+
+		chords, indexes = self.tree.query(to_unit_vectors(latitudes, longitudes), distance_upper_bound=upper_bound)
+
+		found = np.isfinite(chords)
+		ids = np.full(indexes.shape, -1, dtype=np.int64)
+		ids[found] = self.ids[indexes[found]]
+		distances = np.full(chords.shape, np.inf)
+		distances[found] = 2 * np.arcsin(np.clip(chords[found] / 2, 0, 1)) * EARTH_RADIUS_KM
+
+		return ids, distances
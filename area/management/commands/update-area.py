@@ -3,7 +3,12 @@ import logging
 
 from django.core.management.base import BaseCommand
 
+from area.autocomplete import rebuild_autocomplete_index
+from area.cache import bump_dataset_version
+from area.geocoder import ReverseGeocoder
+from area.snapshot import AreaSnapshot
 from area.utils import Geoname
+from common.indexes import restore_deferred_indexes
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +37,78 @@ class Command(BaseCommand):
 				help='Selectively import data into the database'
 		)
 
+		parser.add_argument(
+				'--sync',
+				action='store_true',
+				default=False,
+				dest='sync',
+				help='Apply the daily geonames modification and deletion files to the cities'
+		)
+
+		parser.add_argument(
+				'--batch-size',
+				default=1000,
+				type=int,
+				dest='batch_size',
+				help='Number of rows written to the database per query'
+		)
+
+		parser.add_argument(
+				'--workers',
+				default=1,
+				type=int,
+				dest='workers',
+				help='Number of processes importing cities in parallel'
+		)
+
+		parser.add_argument(
+				'--defer-indexes',
+				action='store_true',
+				default=False,
+				dest='defer_indexes',
+				help='Drop secondary city indexes during the import and rebuild them afterwards'
+		)
+
+		parser.add_argument(
+				'--queue-size',
+				default=4,
+				type=int,
+				dest='queue_size',
+				help='Number of parsed batches waiting to be written when importing all data'
+		)
+
+		parser.add_argument(
+				'--offline',
+				action='store_true',
+				default=False,
+				dest='offline',
+				help='Import the local copy of the files without downloading them'
+		)
+
+		parser.add_argument(
+				'--dry-run',
+				action='store_true',
+				default=False,
+				dest='dry_run',
+				help='Report the rows that would change without writing to the database'
+		)
+
+		parser.add_argument(
+				'--trace-memory',
+				action='store_true',
+				default=False,
+				dest='trace_memory',
+				help='Trace the peak memory of Python allocations for the import report, which slows the import down'
+		)
+
+		parser.add_argument(
+				'--log-metrics',
+				action='store_true',
+				default=False,
+				dest='log_metrics',
+				help='Log the timings of every import stage to the metrics logger'
+		)
+
 		parser.add_argument(
 				'--quiet',
 				action='store_true',
@@ -46,21 +123,70 @@ class Command(BaseCommand):
 		self.flush = self.options['flush']
 		self.imports = self.options['import']
 		self.quiet = self.options['quiet']
+		self.offline = self.options['offline']
+		self.dry_run = self.options['dry_run']
+		self.trace_memory = self.options['trace_memory']
+		self.log_metrics = self.options['log_metrics']
+		self.workers = self.options['workers']
+		self.batch_size = self.options['batch_size']
+		self.sync = self.options['sync']
+		self.defer_indexes = self.options['defer_indexes']
+		self.queue_size = self.options['queue_size']
 
-		geoname = Geoname(quiet=self.quiet, force=self.force)
+		# Indexes dropped by a killed --defer-indexes run are rebuilt whether or not this run defers them again
+		if not self.dry_run:
+			restore_deferred_indexes()
+
+		# Importing everything downloads ahead and parses on another thread while the database is written
+		pipeline = 'all' in self.imports.split(',')
+		geoname = Geoname(quiet=self.quiet, force=self.force, batch_size=self.batch_size, offline=self.offline,
+		                  workers=self.workers, dry_run=self.dry_run, defer_indexes=self.defer_indexes,
+		                  pipeline=pipeline, queue_size=self.queue_size, trace_memory=self.trace_memory)
 
 		self.flushes = [e for e in self.flush.split(',') if e]
 		if 'all' in self.flushes:
 			self.flushes = geoname.import_options()
 		for flush in self.flushes:
 			func = getattr(geoname, "flush_" + flush)
-			func()
+			counts = func()
+			for label, count in counts.items():
+				self.stdout.write("%s %d %s rows" % ("Would delete" if self.dry_run else "Deleted", count, label))
 
 		self.imports = [e for e in self.imports.split(',') if e]
 		if 'all' in self.imports:
 			self.imports = geoname.import_options()
 		if self.flushes:
 			self.imports = []
+		if pipeline and self.imports:
+			geoname.prefetch(self.imports)
 		for imports in self.imports:
 			func = getattr(geoname, "import_" + imports)
 			func()
+
+		for report in geoname.download_reports:
+			self.stdout.write("Downloaded %s in %.1fs" % (report['file_name'], report['seconds']))
+		for report in [stage.report() for stage in geoname.stages]:
+			self.stdout.write("%s: %d batches, %.1f batches/s, writer waited %.1fs, queue depth %.2f mean, %d max" % (
+					report['stage'], report['items'], report['items_per_second'], report['consumer_waited'],
+					report['mean_queue_depth'], report['max_queue_depth']))
+
+		for key, report in geoname.diffs.items():
+			self.stdout.write("%s: %d inserted, %d updated, %d unchanged, %d skipped, %d not in the file" % (
+					key, report['inserted'], report['updated'], report['unchanged'], report['skipped'],
+					report['missing']))
+
+		if self.log_metrics:
+			geoname.telemetry.log('geoname')
+
+		if self.dry_run:
+			return
+
+		if self.sync:
+			geoname.sync_city()
+
+		# Files skipped as up-to-date leave the autocomplete index, geocoder and snapshot as they are
+		if geoname.data_changed:
+			rebuild_autocomplete_index(batch_size=self.batch_size)
+			ReverseGeocoder.build()
+			version = bump_dataset_version()
+			AreaSnapshot.build(version=version)
@@ -0,0 +1,76 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+import re
+import unicodedata
+
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.geos import Point
+from django.db import models
+from django.db.models.expressions import RawSQL
+
+
+def normalize_name(name):
+	"""Fold a place name for lookups: strip accents, case fold and collapse whitespace"""
+	name = unicodedata.normalize('NFKD', name)
+	name = ''.join(c for c in name if not unicodedata.combining(c))
+	return re.sub(r'\s+', ' ', name.casefold()).strip()
+
+
+class CityManager(models.Manager):
+
+	def search(self, name):
+		"""Cities known by ``name`` in any language, most populous first"""
+		return self.filter(alternate_names__normalized=normalize_name(name)).distinct().order_by('-population')
+
+	def search_prefix(self, prefix):
+		return self.filter(alternate_names__normalized__startswith=normalize_name(prefix)).distinct().order_by(
+				'-population')
+
+	def search_similar(self, name):
+		"""Cities with a name similar to ``name``, served by the trigram index on alternate names"""
+		return self.filter(alternate_names__normalized__trigram_similar=normalize_name(name)).distinct().order_by(
+				'-population')
+
+	def within(self, latitude, longitude, radius, min_population=None):
+		"""
+		Cities within ``radius`` km of the given coordinates with their region and country, nearest first.
+
+		The search circle is matched with ``ST_DWithin`` on ``location::geography``, served by the expression index
+		of the same name, so it holds near the poles and across the antimeridian.
+		"""
+		point = Point(longitude, latitude, srid=4326)
+		location = '{}.location::geography'.format(self.model._meta.db_table)
+		target = 'ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography'
+
+		queryset = self.select_related('region', 'country').extra(
+				where=['ST_DWithin({}, {}, %s)'.format(location, target)],
+				params=[longitude, latitude, radius * 1000]
+		)
+		if min_population:
+			queryset = queryset.filter(population__gte=min_population)
+
+		return queryset.annotate(distance=Distance('location', point)).order_by('distance')
+
+	def nearest(self, latitude, longitude, radius=50, candidates=10):
+		"""
+		City closest to the given coordinates within ``radius`` km, with its region and country, or None.
+
+		Candidates are searched and ordered on ``location::geography``, served by the expression index of the same
+		name, so the ``<->`` distance is measured on the sphere and stays right near the poles and across the
+		antimeridian. The ``candidates`` nearest cities are then ranked by their distance on the spheroid.
+		"""
+		point = Point(longitude, latitude, srid=4326)
+		location = '{}.location::geography'.format(self.model._meta.db_table)
+		target = 'ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography'
+
+		queryset = self.select_related('region', 'country').extra(
+				where=['ST_DWithin({}, {}, %s)'.format(location, target)],
+				params=[longitude, latitude, radius * 1000]
+		).annotate(
+				distance=Distance('location', point)
+		).order_by(
+				RawSQL('{} <-> {}'.format(location, target), (longitude, latitude))
+		)[:candidates]
+
+		cities = [city for city in queryset if city.distance.km <= radius]
+		return min(cities, key=lambda city: city.distance.m) if cities else None
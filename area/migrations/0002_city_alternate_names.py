@@ -0,0 +1,60 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('area', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='city',
+            name='elevation',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='city',
+            name='featureCode',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='city',
+            name='population',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='city',
+            name='timezone',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.CreateModel(
+            name='CityAlternateName',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('normalized', models.CharField(max_length=200)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alternate_names',
+                                           to='area.City')),
+            ],
+            options={
+                'verbose_name': 'City Alternate Name',
+                'verbose_name_plural': 'City Alternate Names',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cityalternatename',
+            index=models.Index(fields=['normalized'], name='area_altname_prefix_idx',
+                               opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='cityalternatename',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['normalized'], name='area_altname_trgm_idx',
+                                                           opclasses=['gin_trgm_ops']),
+        ),
+    ]
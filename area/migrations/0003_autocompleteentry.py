@@ -0,0 +1,38 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('area', '0002_city_alternate_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutocompleteEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('country', 'Country'), ('region', 'Region'), ('city', 'City')],
+                                          max_length=10)),
+                ('object_id', models.CharField(max_length=64)),
+                ('name', models.CharField(max_length=200)),
+                ('label', models.CharField(max_length=500)),
+                ('normalized', models.CharField(max_length=200)),
+                ('prefix', models.CharField(max_length=3)),
+                ('population', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Autocomplete Entry',
+                'verbose_name_plural': 'Autocomplete Entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='autocompleteentry',
+            index=models.Index(fields=['prefix', '-population'], name='area_autocomplete_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='autocompleteentry',
+            index=models.Index(fields=['kind', 'prefix', '-population'], name='area_autocomplete_kind_idx'),
+        ),
+    ]
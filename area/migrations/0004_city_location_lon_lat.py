@@ -0,0 +1,18 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Earlier imports stored city locations as (latitude, longitude); points must be (longitude, latitude)"""
+
+    dependencies = [
+        ('area', '0003_autocompleteentry'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='UPDATE area_city SET location = ST_FlipCoordinates(location) WHERE location IS NOT NULL',
+            reverse_sql='UPDATE area_city SET location = ST_FlipCoordinates(location) WHERE location IS NOT NULL',
+        ),
+    ]
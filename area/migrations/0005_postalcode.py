@@ -0,0 +1,36 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('area', '0004_city_location_lon_lat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostalCode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('postal_code', models.CharField(max_length=20)),
+                ('name', models.CharField(max_length=180)),
+                ('location', django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326)),
+                ('accuracy', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('country', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postal_codes',
+                                              to='area.Country')),
+                ('region', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                             related_name='postal_codes', to='area.Region')),
+            ],
+            options={
+                'verbose_name': 'Postal Code',
+                'verbose_name_plural': 'Postal Codes',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postalcode',
+            index=models.Index(fields=['country', 'postal_code'], name='area_postalcode_lookup_idx'),
+        ),
+    ]
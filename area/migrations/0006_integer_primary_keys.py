@@ -0,0 +1,80 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+from django.db import migrations, models
+
+# Foreign key columns converted along with the primary keys they point to. As varchar columns they got a
+# varchar_pattern_ops "_like" index, which cannot be rebuilt for an integer column and which Django 3.0 does not drop
+# when it converts the referencing columns.
+CONVERTED_FOREIGN_KEYS = [
+    ('area_region', 'country_id'),
+    ('area_city', 'country_id'),
+    ('area_city', 'region_id'),
+    ('area_cityalternatename', 'city_id'),
+    ('area_postalcode', 'country_id'),
+    ('area_postalcode', 'region_id'),
+]
+
+DROP_LIKE_INDEXES = """
+DO $$
+DECLARE
+    index_name text;
+BEGIN
+    FOR index_name IN
+        SELECT i.indexrelid::regclass::text
+        FROM pg_index i
+        JOIN pg_opclass o ON o.oid = i.indclass[0]
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indnatts = 1 AND o.opcname IN ('varchar_pattern_ops', 'text_pattern_ops')
+          AND (i.indrelid::regclass::text, a.attname::text) IN (%s)
+    LOOP
+        EXECUTE 'DROP INDEX ' || index_name;
+    END LOOP;
+END
+$$;
+""" % ', '.join("('%s', '%s')" % column for column in CONVERTED_FOREIGN_KEYS)
+
+CREATE_LIKE_INDEXES = [
+    'CREATE INDEX %s_%s_like ON %s (%s varchar_pattern_ops);' % (table, column, table, column)
+    for table, column in CONVERTED_FOREIGN_KEYS
+]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('area', '0005_postalcode'),
+    ]
+
+    operations = [
+        # Reversed, this runs once the columns are varchar again
+        migrations.RunSQL(DROP_LIKE_INDEXES, reverse_sql=CREATE_LIKE_INDEXES),
+        migrations.AlterUniqueTogether(
+            name='city',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='continent',
+            name='code',
+            field=models.CharField(max_length=2, primary_key=True, serialize=False),
+        ),
+        # Changing the type of a primary key also converts the foreign keys pointing to it
+        migrations.AlterField(
+            model_name='country',
+            name='id',
+            field=models.IntegerField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='region',
+            name='id',
+            field=models.IntegerField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='city',
+            name='id',
+            field=models.IntegerField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='autocompleteentry',
+            name='object_id',
+            field=models.IntegerField(),
+        ),
+    ]
@@ -0,0 +1,17 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('area', '0007_datasetversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='autocompleteentry',
+            index=models.Index(fields=['prefix', 'kind'], name='area_autocomplete_like_idx',
+                               opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+    ]
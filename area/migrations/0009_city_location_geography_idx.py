@@ -0,0 +1,17 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('area', '0008_autocomplete_like_idx'),
+    ]
+
+    operations = [
+        # Serves nearest neighbour searches ordered by the spherical distance of City.objects.nearest
+        migrations.RunSQL(
+            'CREATE INDEX area_city_location_geog_idx ON area_city USING GIST ((location::geography));',
+            reverse_sql='DROP INDEX area_city_location_geog_idx;'
+        ),
+    ]
@@ -1,10 +1,14 @@
 #  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
 
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex
+
+from area.enums import AreaKindEnum
+from area.managers import CityManager
 
 # Create your models here.
 class Continent(models.Model):
-	code = models.CharField(max_length=2, primary_key=True, db_index=True)
+	code = models.CharField(max_length=2, primary_key=True)
 	name = models.CharField(max_length=64, db_index=True)
 
 	class Meta:
@@ -17,7 +21,7 @@ class Continent(models.Model):
 
 
 class Country(models.Model):
-	id = models.CharField(max_length=64, db_index=True, primary_key=True)
+	id = models.IntegerField(primary_key=True)
 	name = models.CharField(max_length=64, db_index=True)
 	code = models.CharField(max_length=2, db_index=True, unique=True)
 	code3 = models.CharField(max_length=3, db_index=True, unique=True)
@@ -34,7 +38,7 @@ class Country(models.Model):
 
 
 class Region(models.Model):
-	id = models.CharField(max_length=64, db_index=True, primary_key=True)
+	id = models.IntegerField(primary_key=True)
 	code = models.CharField(max_length=64, db_index=True)
 	name = models.CharField(max_length=64, db_index=True)
 	asciiName = models.CharField(max_length=64, db_index=True)
@@ -54,20 +58,30 @@ class Region(models.Model):
 		return self.country
 
 	def full_code(self):
-		return ".".join([self.parent.code, self.code])
+		if Region.country.is_cached(self):
+			return ".".join([self.country.code, self.code])
+
+		from area.registry import registry
+		return ".".join([registry.country(self.country_id).code, self.code])
 
 
 class City(models.Model):
-	id = models.CharField(max_length=64, db_index=True, primary_key=True)
+	id = models.IntegerField(primary_key=True)
 	name = models.CharField(max_length=200, db_index=True)
 	asciiName = models.CharField(max_length=200, db_index=True)
 	country = models.ForeignKey(to=Country, related_name='cities', on_delete=models.CASCADE)
 	region = models.ForeignKey(to=Region, related_name='cities', on_delete=models.CASCADE, null=True, blank=True)
+	# Also indexed as geography by migration 0009, for nearest neighbour searches on the sphere
 	location = models.PointField(null=True, blank=True, db_index=True)
+	population = models.BigIntegerField(default=0)
+	elevation = models.IntegerField(null=True, blank=True)
+	featureCode = models.CharField(max_length=10, blank=True)
+	timezone = models.CharField(max_length=40, blank=True)
+
+	objects = CityManager()
 
 	class Meta:
 		ordering = ['name']
-		unique_together = ('country', 'region', 'id', 'name')
 		verbose_name = 'City'
 		verbose_name_plural = 'Cities'
 
@@ -76,4 +90,85 @@ class City(models.Model):
 
 	@property
 	def parent(self):
-		return self.region
\ No newline at end of file
+		return self.region
+
+
+class CityAlternateName(models.Model):
+	city = models.ForeignKey(to=City, related_name='alternate_names', on_delete=models.CASCADE)
+	name = models.CharField(max_length=200)
+	normalized = models.CharField(max_length=200)
+
+	class Meta:
+		indexes = [
+				models.Index(fields=['normalized'], name='area_altname_prefix_idx', opclasses=['varchar_pattern_ops']),
+				GinIndex(fields=['normalized'], name='area_altname_trgm_idx', opclasses=['gin_trgm_ops'])
+		]
+		verbose_name = 'City Alternate Name'
+		verbose_name_plural = 'City Alternate Names'
+
+	def __str__(self):
+		return self.name
+
+
+class PostalCode(models.Model):
+	"""A place served by a postal code. Codes are not unique, one code can cover several places."""
+	country = models.ForeignKey(to=Country, related_name='postal_codes', on_delete=models.CASCADE)
+	region = models.ForeignKey(to=Region, related_name='postal_codes', on_delete=models.SET_NULL, null=True,
+	                           blank=True)
+	postal_code = models.CharField(max_length=20)
+	name = models.CharField(max_length=180)
+	location = models.PointField(null=True, blank=True)
+	accuracy = models.PositiveSmallIntegerField(null=True, blank=True)
+
+	class Meta:
+		indexes = [
+				models.Index(fields=['country', 'postal_code'], name='area_postalcode_lookup_idx')
+		]
+		verbose_name = 'Postal Code'
+		verbose_name_plural = 'Postal Codes'
+
+	def __str__(self):
+		return " ".join([self.postal_code, self.name])
+
+
+class DatasetVersion(models.Model):
+	"""Single row holding the version of the area data, shared by every process through the database"""
+	id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+	version = models.BigIntegerField()
+
+	class Meta:
+		verbose_name = 'Dataset Version'
+		verbose_name_plural = 'Dataset Versions'
+
+	def __str__(self):
+		return str(self.version)
+
+
+class AutocompleteEntry(models.Model):
+	"""
+	Denormalized name index behind the autocomplete API, rebuilt after every import.
+
+	``prefix`` holds the first three characters of ``normalized`` so a lookup is served by an index scan over
+	``(kind, prefix, -population)`` that stops as soon as enough names matching the full query have been found.
+	"""
+	kind = models.CharField(max_length=10, choices=AreaKindEnum.choices())
+	object_id = models.IntegerField()
+	name = models.CharField(max_length=200)
+	label = models.CharField(max_length=500)
+	normalized = models.CharField(max_length=200)
+	prefix = models.CharField(max_length=3)
+	population = models.BigIntegerField(default=0)
+
+	class Meta:
+		indexes = [
+				models.Index(fields=['prefix', '-population'], name='area_autocomplete_rank_idx'),
+				models.Index(fields=['kind', 'prefix', '-population'], name='area_autocomplete_kind_idx'),
+				# LIKE on queries shorter than the prefix can only use an index with a pattern operator class
+				models.Index(fields=['prefix', 'kind'], name='area_autocomplete_like_idx',
+				             opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'])
+		]
+		verbose_name = 'Autocomplete Entry'
+		verbose_name_plural = 'Autocomplete Entries'
+
+	def __str__(self):
+		return self.label
@@ -0,0 +1,77 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+import logging
+from functools import lru_cache
+
+from django.core.cache import cache
+
+from area.cache import bump_dataset_version, get_dataset_version
+from area.models import Continent, Country, Region
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 8192
+CACHE_TIMEOUT = 60 * 60 * 24
+MISSING = object()
+
+
+class AreaRegistry(object):
+	"""
+	Cached lookups of continents, countries and regions.
+
+	Rows are kept in an in-process LRU in front of the Django cache, both keyed on the area dataset version.
+	``update-area`` bumps that version in the database after every import or flush, so every process stops using
+	old rows once it re-reads the version, which ``get_dataset_version`` does at most every second.
+	"""
+
+	def current_version(self):
+		return get_dataset_version()
+
+	def invalidate(self):
+		bump_dataset_version()
+
+	def continent(self, code):
+		return _lookup(self.current_version(), 'continent', code)
+
+	def country(self, country_id):
+		return _lookup(self.current_version(), 'country', int(country_id))
+
+	def country_by_code(self, code):
+		return _lookup(self.current_version(), 'country_code', code)
+
+	def region(self, region_id):
+		return _lookup(self.current_version(), 'region', int(region_id))
+
+	def region_by_full_code(self, full_code):
+		"""Region by its ``Region.full_code()``, e.g. ``IN.16``"""
+		return _lookup(self.current_version(), 'region_code', full_code)
+
+
+def _load(kind, key):
+	if kind == 'continent':
+		return Continent.objects.filter(code=key).first()
+	if kind == 'country':
+		return Country.objects.filter(pk=key).first()
+	if kind == 'country_code':
+		return Country.objects.filter(code=key).first()
+	if kind == 'region':
+		return Region.objects.select_related('country').filter(pk=key).first()
+	if kind == 'region_code':
+		country_code, _, code = key.partition('.')
+		return Region.objects.select_related('country').filter(country__code=country_code, code=code).first()
+	raise ValueError("Unknown area kind '%s'" % kind)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _lookup(version, kind, key):
+	cache_key = 'area:registry:{}:{}:{}'.format(version, kind, key)
+
+	value = cache.get(cache_key, MISSING)
+	if value is MISSING:
+		value = _load(kind, key)
+		cache.set(cache_key, value, CACHE_TIMEOUT)
+
+	return value
+
+
+registry = AreaRegistry()
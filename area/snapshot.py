@@ -0,0 +1,229 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+import json
+import logging
+import mmap
+import os
+import struct
+
+import numpy as np
+from django.conf import settings as django_settings
+
+from area.cache import get_dataset_version
+from area.models import Continent, Country, Region
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PIAREA'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<6sHI')
+ALIGNMENT = 8
+
+
+class AreaSnapshot(object):
+	"""
+	Compact, read-only copy of the continent, country and region hierarchy.
+
+	The snapshot is a single binary file: a small JSON header describing a set of numpy arrays laid out after it.
+	Names and codes are interned into one UTF-8 string pool referenced by index, ids and parent links are plain
+	integer arrays, and sorted key arrays allow ``code -> id`` lookups by binary search. Readers map the file with
+	``mmap`` and view the arrays in place, so lookups need no query and every process shares the same pages.
+	"""
+	file_name = 'area_snapshot.bin'
+
+	def __init__(self, buffer, header):
+		self.buffer = buffer
+		self.version = header['version']
+		self.arrays = {}
+
+		for name, (dtype, count, offset) in header['arrays'].items():
+			self.arrays[name] = np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=offset)
+
+		self.string_offsets = self.arrays['string_offsets']
+		self.strings = self.arrays['strings']
+		self.continents = self.arrays['continents']
+		self.countries = self.arrays['countries']
+		self.regions = self.arrays['regions']
+
+	@classmethod
+	def path(cls, data_dir=None):
+		return os.path.join(data_dir or os.path.join(django_settings.MEDIA_ROOT, 'geoname'), cls.file_name)
+
+	@classmethod
+	def build(cls, version, data_dir=None):
+		"""Write a snapshot of the current database tagged with the area dataset ``version``"""
+		cls.write(path=cls.path(data_dir), version=version,
+		          continent_rows=Continent.objects.values_list('code', 'name'),
+		          country_rows=Country.objects.values_list('id', 'code', 'code3', 'continent_id', 'name'),
+		          region_rows=Region.objects.values_list('id', 'country_id', 'country__code', 'code', 'name'))
+
+	@classmethod
+	def write(cls, path, version, continent_rows, country_rows, region_rows):
+		pool = {}
+
+		def intern(value):
+			return pool.setdefault(value, len(pool))
+
+		continent_rows = sorted(continent_rows)
+		continent_index = {code: index for index, (code, _) in enumerate(continent_rows)}
+		continents = np.array([(code.encode('ascii'), intern(name)) for code, name in continent_rows],
+		                      dtype=[('code', 'S2'), ('name', '<i4')])
+
+		country_rows = sorted(country_rows)
+		country_index = {row[0]: index for index, row in enumerate(country_rows)}
+		countries = np.array([(country_id, code.encode('ascii'), code3.encode('ascii'),
+		                       continent_index.get(continent_id, -1), intern(name))
+		                      for country_id, code, code3, continent_id, name in country_rows],
+		                     dtype=[('id', '<i8'), ('code', 'S2'), ('code3', 'S3'), ('continent', '<i4'),
+		                            ('name', '<i4')])
+
+		region_rows = sorted(region_rows)
+		regions = np.array([(region_id, country_index[country_id], intern(code), intern(name))
+		                    for region_id, country_id, _, code, name in region_rows],
+		                   dtype=[('id', '<i8'), ('country', '<i4'), ('code', '<i4'), ('name', '<i4')])
+		region_keys = np.array([".".join([country_code, code]).encode('utf-8')
+		                        for _, _, country_code, code, _ in region_rows], dtype='S')
+
+		encoded = [value.encode('utf-8') for value in pool]
+		string_offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+		string_offsets[1:] = np.cumsum([len(value) for value in encoded])
+		strings = np.frombuffer(b''.join(encoded), dtype='u1')
+
+		country_order = np.argsort(countries['code'], kind='stable').astype('<i4')
+		region_order = np.argsort(region_keys, kind='stable').astype('<i4')
+
+		arrays = {
+				'string_offsets':       string_offsets,
+				'strings':              strings,
+				'continents':           continents,
+				'countries':            countries,
+				'regions':              regions,
+				'country_codes_sorted': np.ascontiguousarray(countries['code'][country_order]),
+				'country_code_order':   country_order,
+				'region_keys_sorted':   np.ascontiguousarray(region_keys[region_order]),
+				'region_key_order':     region_order
+		}
+
+		# Offsets are relative to the aligned end of the header
+		layout = {}
+		offset = 0
+		for name, array in arrays.items():
+			offset += -offset % ALIGNMENT
+			layout[name] = (array.dtype.descr if array.dtype.fields else array.dtype.str, len(array), offset)
+			offset += array.nbytes
+
+		header = json.dumps({'version': version, 'arrays': layout}).encode('utf-8')
+		data_start = cls.__data_start__(len(header))
+
+		if not os.path.exists(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+
+		tmp_path = path + '.tmp'
+		with open(tmp_path, 'wb') as file_obj:
+			file_obj.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(header)))
+			file_obj.write(header)
+			for name, array in arrays.items():
+				file_obj.seek(data_start + layout[name][2])
+				file_obj.write(array.tobytes())
+		os.replace(tmp_path, path)
+
+		logger.info("Built area snapshot with %d countries and %d regions", len(countries), len(regions))
+
+	@staticmethod
+	def __data_start__(header_size):
+		data_start = HEADER.size + header_size
+		return data_start + -data_start % ALIGNMENT
+
+	@classmethod
+	def load(cls, data_dir=None):
+		"""Map the snapshot file, or return None when there is none or it was written in another format"""
+		return cls.open(cls.path(data_dir))
+
+	@classmethod
+	def open(cls, path):
+		try:
+			with open(path, 'rb') as file_obj:
+				buffer = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+		except (FileNotFoundError, ValueError):
+			return None
+
+		magic, format_version, header_size = HEADER.unpack_from(buffer, 0)
+		if magic != MAGIC or format_version != FORMAT_VERSION:
+			logger.warning("Ignoring area snapshot with unknown format %s/%s", magic, format_version)
+			return None
+
+		header = json.loads(bytes(buffer[HEADER.size:HEADER.size + header_size]).decode('utf-8'))
+		data_start = cls.__data_start__(header_size)
+		for name, (dtype, count, offset) in header['arrays'].items():
+			header['arrays'][name] = ([tuple(field) for field in dtype] if isinstance(dtype, list) else dtype, count,
+			                          data_start + offset)
+
+		return cls(buffer=buffer, header=header)
+
+	@classmethod
+	def load_current(cls, data_dir=None):
+		"""The snapshot, provided it was written for the current area dataset version"""
+		snapshot = cls.load(data_dir)
+		if snapshot is not None and snapshot.version == get_dataset_version():
+			return snapshot
+		return None
+
+	def string(self, index):
+		return bytes(self.strings[self.string_offsets[index]:self.string_offsets[index + 1]]).decode('utf-8')
+
+	def __find__(self, keys, order, key):
+		position = np.searchsorted(keys, key)
+		if position < len(keys) and keys[position] == key:
+			return int(order[position])
+		return None
+
+	def __find_id__(self, array, object_id):
+		position = np.searchsorted(array['id'], int(object_id))
+		if position < len(array) and array['id'][position] == int(object_id):
+			return int(position)
+		return None
+
+	def country_id(self, code):
+		index = self.__find__(self.arrays['country_codes_sorted'], self.arrays['country_code_order'],
+		                      code.encode('ascii'))
+		return None if index is None else int(self.countries['id'][index])
+
+	def country_name(self, country_id):
+		index = self.__find_id__(self.countries, country_id)
+		return None if index is None else self.string(self.countries['name'][index])
+
+	def region_id(self, full_code):
+		index = self.__find__(self.arrays['region_keys_sorted'], self.arrays['region_key_order'],
+		                      full_code.encode('utf-8'))
+		return None if index is None else int(self.regions['id'][index])
+
+	def region_name(self, region_id):
+		index = self.__find_id__(self.regions, region_id)
+		return None if index is None else self.string(self.regions['name'][index])
+
+	def region_country_id(self, region_id):
+		index = self.__find_id__(self.regions, region_id)
+		return None if index is None else int(self.countries['id'][self.regions['country'][index]])
+
+	def country_index(self):
+		"""``{code: id}`` for every country, as built by ``Geoname.__build_country_index__``"""
+		return {code.decode('ascii'): country_id for code, country_id in
+		        zip(self.countries['code'].tolist(), self.countries['id'].tolist())}
+
+	def region_index(self):
+		"""``{full code: id}`` for every region, as built by ``Geoname.__build_region_index__``"""
+		keys = self.arrays['region_keys_sorted'].tolist()
+		ids = self.regions['id'][self.arrays['region_key_order']].tolist()
+		return {key.decode('utf-8'): region_id for key, region_id in zip(keys, ids)}
+
+
+_snapshot = None
+
+
+def get_snapshot():
+	"""The process wide snapshot for the current dataset version, remapped after an import, or None"""
+	global _snapshot
+
+	if _snapshot is None or _snapshot.version != get_dataset_version():
+		_snapshot = AreaSnapshot.load_current()
+	return _snapshot
@@ -1,10 +1,32 @@
 #  Copyright (c) 2019 - 2019. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
 
+import copy
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
 
-from area.enums import ContinentEnum
-from area.models import City, Continent, Country, Region
-from area.utils import Geoname
+from area.autocomplete import autocomplete, rebuild_autocomplete_index
+from area.cache import bump_dataset_version, get_dataset_version
+from area.enums import AreaKindEnum, ContinentEnum
+from area.geocoder import ReverseGeocoder
+from area.managers import normalize_name
+from area.snapshot import AreaSnapshot
+from area.models import AutocompleteEntry, City, CityAlternateName, Continent, Country, DatasetVersion, PostalCode, \
+	Region
+from area.registry import registry
+from area.utils import Geoname, _import_city_rows, _init_city_worker
+from common.indexes import deferred_indexes, restore_deferred_indexes
+from common.models import DeferredIndex
 
 
 class ContinentTestCase(TestCase):
@@ -38,6 +60,13 @@ class CountryTestCase(TestCase):
 	def test_str(self):
 		self.assertEqual(str(self.country), self.country.name)
 
+	def test_row_count(self):
+		self.assertEqual(Country.objects.count() + self.geoname.count_country, self.geoname.row_count['country'])
+
+	def test_up_to_date(self):
+		self.assertTrue(Geoname(quiet=True).__is_up_to_date__(file_key='country'))
+		self.assertFalse(Geoname(quiet=True, force=True).__is_up_to_date__(file_key='country'))
+
 
 class RegionTestCase(TestCase):
 	@classmethod
@@ -63,6 +92,40 @@ class RegionTestCase(TestCase):
 	def test_full_code(self):
 		self.assertEqual(str(self.region.full_code()), str(self.region.parent.code + '.' + self.region.code))
 
+	def test_registry(self):
+		self.assertEqual(registry.region_by_full_code(self.region.full_code()), self.region)
+		self.assertEqual(registry.country_by_code(self.region.country.code), self.region.country)
+		self.assertEqual(registry.region(self.region.pk), self.region)
+		region = Region.objects.get(pk=self.region.pk)
+		with self.assertNumQueries(0):
+			registry.region(self.region.pk)
+			self.assertEqual(region.full_code(), self.region.full_code())
+		registry.invalidate()
+		with self.assertNumQueries(1):
+			registry.region(self.region.pk)
+
+	def test_dataset_version(self):
+		version = bump_dataset_version()
+		self.assertEqual(DatasetVersion.objects.get().version, version)
+
+		# Another process bumping the version is only seen through the database row
+		DatasetVersion.objects.filter(pk=1).update(version=version + 1)
+		self.assertEqual(get_dataset_version(refresh=True), version + 1)
+		self.assertGreater(bump_dataset_version(), version + 1)
+
+	def test_snapshot(self):
+		AreaSnapshot.build(version=get_dataset_version())
+		snapshot = AreaSnapshot.load_current()
+		self.assertEqual(snapshot.region_id(self.region.full_code()), self.region.pk)
+		self.assertEqual(snapshot.region_name(self.region.pk), self.region.name)
+		self.assertEqual(snapshot.country_id(self.region.country.code), self.region.country_id)
+
+		with self.assertNumQueries(0):
+			region_index = snapshot.region_index()
+		self.geoname.hierarchy_changed = True
+		self.geoname.__build_region_index__()
+		self.assertDictEqual(region_index, self.geoname.region_index)
+
 
 class CityTestCase(TestCase):
 	@classmethod
@@ -86,6 +149,250 @@ class CityTestCase(TestCase):
 	def test_parent(self):
 		self.assertEqual(self.city.parent, self.city.region)
 
+	def test_region_country(self):
+		self.assertEqual(self.city.region.country_id, self.city.country_id)
+
+	def test_search(self):
+		self.assertIn(self.city, City.objects.search(self.city.asciiName.upper()))
+		self.assertIn(self.city, City.objects.search_prefix(self.city.asciiName[:3]))
+
+	def test_autocomplete(self):
+		rebuild_autocomplete_index()
+		results = autocomplete(self.city.name, kind=AreaKindEnum.city.name)
+		self.assertIn(self.city.pk, [result['object_id'] for result in results])
+
+		response = self.client.get(reverse('area:autocomplete-list'), {'q': self.city.name})
+		self.assertEqual(response.status_code, 200)
+		response = self.client.get(reverse('area:autocomplete-list'), {'q': self.city.name},
+		                           HTTP_IF_NONE_MATCH=response['ETag'])
+		self.assertEqual(response.status_code, 304)
+
+	def test_autocomplete_distinct(self):
+		# A popular city known by many names must not crowd out the other matches
+		entries = [AutocompleteEntry(kind=AreaKindEnum.city.name, object_id=1, name='Popular', label='Popular',
+		                             normalized='zzq%d' % index, prefix='zzq', population=10 ** 9) for index in
+		           range(10)]
+		entries.append(AutocompleteEntry(kind=AreaKindEnum.city.name, object_id=2, name='Small', label='Small',
+		                                  normalized='zzqa', prefix='zzq', population=1))
+		AutocompleteEntry.objects.bulk_create(entries)
+
+		self.assertListEqual([result['object_id'] for result in autocomplete('zzq', limit=2)], [1, 2])
+		self.assertListEqual([result['object_id'] for result in autocomplete('zz', limit=2)], [1, 2])
+
+	def test_nearest(self):
+		city = City.objects.nearest(latitude=self.city.location.y, longitude=self.city.location.x)
+		self.assertEqual(city.location, self.city.location)
+
+		response = self.client.get(reverse('area:reverse-geocode-list'),
+		                           {'lat': self.city.location.y, 'lon': self.city.location.x})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['distance'], 0)
+
+	def test_nearest_antimeridian(self):
+		city = City.objects.create(id=999999999, name='East', asciiName='East', country=self.city.country,
+		                           location=Point(-179.99, -16.5))
+		self.assertEqual(City.objects.nearest(latitude=-16.5, longitude=179.99, radius=10), city)
+
+	def test_within(self):
+		cities = City.objects.within(latitude=self.city.location.y, longitude=self.city.location.x, radius=50)
+		self.assertIn(self.city, cities)
+		self.assertEqual(cities[0].distance.km, 0)
+
+		response = self.client.get(reverse('area:nearby-list'), {'lat': self.city.location.y,
+		                                                         'lon': self.city.location.x, 'radius': 50,
+		                                                         'group': 'region'})
+		self.assertEqual(response.status_code, 200)
+
+	def test_within_high_latitude(self):
+		# Further east than a degree box of the circle reaches at this latitude, yet under 200 km away
+		city = City.objects.create(id=999999999, name='North', asciiName='North', country=self.city.country,
+		                           location=Point(20.7, 85.33))
+		self.assertIn(city, City.objects.within(latitude=85, longitude=0, radius=200))
+
+	def test_reverse_geocoder(self):
+		ReverseGeocoder.build()
+		geocoder = ReverseGeocoder.load()
+		ids, distances = geocoder.nearest([self.city.location.y], [self.city.location.x], max_distance=1)
+		self.assertLess(distances[0], 0.001)
+		self.assertEqual(City.objects.get(id=ids[0]).location, self.city.location)
+
+	def test_region_index(self):
+		with self.assertNumQueries(2):
+			self.geoname.__build_region_index__()
+		self.assertEqual(self.geoname.region_index[self.city.region.full_code()], self.city.region_id)
+
+	def test_postal_code(self):
+		self.geoname.__build_country_index__()
+		self.geoname.__build_region_index__()
+		record = namedtuple('Record', self.geoname.files['postal_code']['fields'])
+		postal_code = self.geoname.__build_postal_code__(record(
+				self.city.country.code, ' ab1 ', self.city.name, '', self.city.region.code, '', '', '', '',
+				str(self.city.location.y), str(self.city.location.x), '4'))
+		postal_code.save()
+		self.assertEqual(postal_code.region_id, self.city.region_id)
+
+		response = self.client.get(reverse('area:postal-code-list'), {'country': self.city.country.code.lower(),
+		                                                              'postal_code': 'AB1'})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data[0]['name'], self.city.name)
+		self.assertEqual(response.data[0]['latitude'], self.city.location.y)
+
+	def test_import_postal_code(self):
+		data_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, data_dir)
+
+		def write(codes):
+			with zipfile.ZipFile(os.path.join(data_dir, 'postalCodes.zip'), 'w') as archive:
+				archive.writestr('allCountries.txt', ''.join('\t'.join([
+						self.city.country.code, code, self.city.name, '', self.city.region.code, '', '', '', '',
+						str(self.city.location.y), str(self.city.location.x), '4']) + '\n' for code in codes))
+
+		write(['AB1', 'AB2', 'AB2'])
+		Geoname(quiet=True, offline=True, data_dir=data_dir).import_postal_code()
+		self.assertEqual(PostalCode.objects.count(), 3)
+		kept = set(PostalCode.objects.filter(postal_code='AB2').values_list('id', flat=True))
+
+		write(['AB2', 'AB2', 'AB3'])
+		geoname = Geoname(quiet=True, offline=True, dry_run=True, data_dir=data_dir)
+		geoname.import_postal_code()
+		self.assertDictEqual(geoname.diffs['postal_code'], {'inserted': 1, 'updated': 0, 'unchanged': 2,
+		                                                    'skipped': 0, 'missing': 1})
+		self.assertTrue(PostalCode.objects.filter(postal_code='AB1').exists())
+
+		Geoname(quiet=True, offline=True, force=True, data_dir=data_dir).import_postal_code()
+		self.assertSetEqual(set(PostalCode.objects.filter(postal_code='AB2').values_list('id', flat=True)), kept)
+		self.assertListEqual(sorted(PostalCode.objects.values_list('postal_code', flat=True)), ['AB2', 'AB2', 'AB3'])
+
+	def test_sync_city(self):
+		data_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, data_dir)
+
+		day = datetime.utcnow().date() - timedelta(days=1)
+		with open(os.path.join(data_dir, 'sync_state.json'), 'w') as fp:
+			json.dump({'city15000': (day - timedelta(days=1)).strftime('%Y-%m-%d')}, fp)
+		with open(os.path.join(data_dir, 'modifications-%s.txt' % day.strftime('%Y-%m-%d')), 'w') as fp:
+			fp.write('')
+		with open(os.path.join(data_dir, 'deletes-%s.txt' % day.strftime('%Y-%m-%d')), 'w') as fp:
+			fp.write('\t'.join([str(self.city.pk), self.city.name, 'duplicate']) + '\n')
+
+		Geoname(quiet=True, data_dir=data_dir).sync_city(population=15000)
+		self.assertFalse(City.objects.filter(pk=self.city.pk).exists())
+
+	def test_admin(self):
+		self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+		response = self.client.get(reverse('admin:area_city_changelist'), {'q': self.city.name})
+		self.assertEqual(response.status_code, 200)
+		self.assertIn(self.city, response.context['cl'].result_list)
+
+	def test_deferred_indexes(self):
+		def indexes():
+			with connection.cursor() as cursor:
+				return set(connection.introspection.get_constraints(cursor, City._meta.db_table))
+
+		before = indexes()
+		with deferred_indexes(City):
+			self.assertLess(len(indexes()), len(before))
+			self.assertEqual(City.objects.get(pk=self.city.pk), self.city)
+		self.assertSetEqual(indexes(), before)
+		self.assertFalse(DeferredIndex.objects.exists())
+
+		# A load killed after dropping the indexes leaves them recorded for the next run
+		interrupted = deferred_indexes(City)
+		interrupted.__enter__()
+		dropped = DeferredIndex.objects.count()
+		self.assertEqual(len(indexes()), len(before) - dropped)
+		self.assertEqual(restore_deferred_indexes(), dropped)
+		self.assertSetEqual(indexes(), before)
+		self.assertFalse(DeferredIndex.objects.exists())
+		# Closed inside the test transaction, where the abandoned load does not rebuild anything
+		interrupted.gen.close()
+
+		# The index serving the alternate name lookups of each city batch is kept
+		with deferred_indexes(CityAlternateName, keep=[CityAlternateName._meta.get_field('city')]):
+			with connection.cursor() as cursor:
+				constraints = connection.introspection.get_constraints(cursor, CityAlternateName._meta.db_table)
+			self.assertTrue(any(constraint['index'] and constraint['columns'] == ['city_id']
+			                    for constraint in constraints.values()))
+
+	def test_pipeline(self):
+		cities = City.objects.count()
+		geoname = Geoname(quiet=True, force=True, pipeline=True, queue_size=2)
+		geoname.import_city(population=15000)
+		self.assertEqual(City.objects.count(), cities)
+		self.assertGreater(geoname.stages[0].report()['items'], 0)
+		self.assertEqual(geoname.diffs['city15000']['unchanged'], cities)
+		# Nothing was written, so update-area leaves the derived indexes and the dataset version alone
+		self.assertFalse(geoname.data_changed)
+
+	def test_parallel_report(self):
+		serial = Geoname(quiet=True, dry_run=True)
+		serial.import_city(population=15000)
+
+		# Run the worker function in process, merging its per-batch reports the way the parent does
+		parallel = Geoname(quiet=True)
+		parallel.city_diff = copy.deepcopy(serial.city_diff)
+		parallel.city_diff.reset()
+		_init_city_worker(serial.files['city15000']['fields'], serial.country_index, serial.region_index,
+		                  copy.deepcopy(serial.city_diff), 1000)
+		rows = [tuple(item) for item in serial.__get_data__(file_key='city15000')]
+		for index in range(0, len(rows), 1000):
+			report = _import_city_rows(rows[index:index + 1000])
+			parallel.count_city += report['skipped']
+			parallel.city_diff.merge(report['counts'], report['seen'])
+			parallel.telemetry.merge(report['stages'], report['skip_reasons'])
+
+		self.assertDictEqual(parallel.city_diff.report(), serial.diffs['city15000'])
+		self.assertEqual(parallel.count_city, serial.count_city)
+		self.assertEqual(parallel.telemetry.report()['stages']['resolve']['rows'], len(rows))
+
+	def test_telemetry(self):
+		report = self.geoname.telemetry.report()
+		for stage in ['download', 'parse', 'resolve', 'diff', 'write']:
+			self.assertIn(stage, report['stages'])
+		self.assertEqual(report['stages']['write']['rows'], City.objects.count() + Region.objects.count() +
+		                 Country.objects.count())
+		self.assertGreater(report['stages']['write']['queries'], 0)
+
+		with open(os.path.join(self.geoname.data_dir, 'import_report.json')) as fp:
+			self.assertIn('stages', json.load(fp))
+
+	def test_dry_run(self):
+		cities = City.objects.count()
+		geoname = Geoname(quiet=True, dry_run=True)
+		geoname.import_city(population=15000)
+		report = geoname.diffs['city15000']
+		self.assertEqual(report['unchanged'], cities)
+		self.assertEqual(report['inserted'] + report['updated'] + report['missing'], 0)
+
+		City.objects.filter(pk=self.city.pk).update(population=self.city.population + 1)
+		geoname.import_city(population=15000)
+		self.assertEqual(geoname.diffs['city15000']['updated'], 1)
+		self.assertEqual(City.objects.get(pk=self.city.pk).population, self.city.population + 1)
+
+	def test_dry_run_checkpoint(self):
+		cities = City.objects.count()
+		geoname = Geoname(quiet=True, dry_run=True)
+		sha256 = geoname.manifest.get(geoname.files['city15000']['file_name']).get('sha256')
+		# Left behind by an interrupted import, which a dry run must not resume from
+		geoname._Geoname__checkpoint_json('city15000', checkpoint={'row': 1000, 'sha256': sha256,
+		                                                           'last_modified': '', 'skipped': 0})
+		self.addCleanup(geoname._Geoname__checkpoint_json, 'city15000', clear=True)
+		geoname.import_city(population=15000)
+		report = geoname.diffs['city15000']
+		self.assertEqual(report['unchanged'], cities)
+		self.assertEqual(report['missing'], 0)
+
+	def test_flush(self):
+		cities = City.objects.count()
+		counts = Geoname(quiet=True, dry_run=True).flush_region()
+		self.assertEqual(counts['area.City'], cities)
+		self.assertEqual(City.objects.count(), cities)
+
+		self.geoname.flush_region()
+		self.assertFalse(City.objects.exists())
+		self.assertFalse(Region.objects.exists())
+		self.assertTrue(Country.objects.exists())
+
 
 class GeonameTestCase(TestCase):
 	@classmethod
@@ -94,3 +401,7 @@ class GeonameTestCase(TestCase):
 
 	def test_import_options(self):
 		self.assertListEqual(self.geoname.import_options(), ['continent', 'country', 'region', 'city'])
+
+	def test_normalize_name(self):
+		self.assertEqual(normalize_name('  São  Paulo '), 'sao paulo')
+		self.assertEqual(normalize_name('MÜNCHEN'), 'munchen')
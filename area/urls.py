@@ -0,0 +1,11 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+from django.urls import include, re_path
+
+from area.api.base.routers import api_urlpatterns as api_v1
+
+app_name = 'area'
+
+urlpatterns = [
+		re_path(r'^v1/', include(api_v1)),
+]
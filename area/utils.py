@@ -4,21 +4,83 @@ import io
 import json
 import logging
 import os
+import threading
+import time
 import zipfile
-from urllib.request import urlopen
+from collections import deque, namedtuple
+from contextlib import closing, ExitStack
+from datetime import datetime, timedelta
+from multiprocessing import Pool
 
 from django.conf import settings as django_settings
 from django.contrib.gis.geos import Point
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import connection, connections, transaction
+from django.db.models import Q
 from tqdm import tqdm
 
 from area.enums import ContinentEnum
-from area.models import City, Continent, Country, Region
+from area.managers import normalize_name
+from area.models import City, CityAlternateName, Continent, Country, PostalCode, Region
+from area.snapshot import AreaSnapshot
+from common.diff import TableDiff
+from common.downloads import Downloader, Manifest
+from common.flush import flush_models
+from common.indexes import deferred_indexes
+from common.pipeline import BoundedStage
+from common.telemetry import Telemetry
 
 logger = logging.getLogger(__name__)
 
+_city_worker = None
+
+
+def _init_city_worker(fields, country_index, region_index, city_diff, batch_size):
+    """Set up the Geoname instance a city import worker process uses for every batch it receives"""
+    global _city_worker
+
+    _city_worker = Geoname(quiet=True, batch_size=batch_size)
+    _city_worker.record = namedtuple('Record', fields)
+    _city_worker.country_index = country_index
+    _city_worker.region_index = region_index
+    _city_worker.city_diff = city_diff
+
+
+def _import_city_rows(rows):
+    """
+    Build and write one batch of city rows in a worker.
+
+    Returns the number of rows read and skipped along with the diff counts, classified ids and telemetry of this
+    batch alone, for the parent to merge into its own.
+    """
+    geoname = _city_worker
+    geoname.count_city = 0
+    geoname.city_diff.reset()
+    geoname.telemetry = Telemetry()
+
+    start = time.perf_counter()
+    cities = [city for city in map(geoname.__build_city__, map(geoname.record._make, rows)) if city is not None]
+    geoname.city_diff.skip(len(rows) - len(cities))
+    cities = geoname.city_diff.changed(cities)
+    geoname.telemetry.add('resolve', time.perf_counter() - start, rows=len(rows))
+
+    with geoname.telemetry.stage('write', rows=len(cities)):
+        existing_ids = set(City.objects.filter(id__in=[city.pk for city in cities]).values_list('id', flat=True))
+        geoname.__save_cities__(cities, existing_ids)
+
+    return {
+        'rows': len(rows),
+        'skipped': geoname.count_city,
+        'counts': geoname.city_diff.counts,
+        'seen': list(geoname.city_diff.seen),
+        'stages': geoname.telemetry.stages,
+        'skip_reasons': dict(geoname.telemetry.skipped)
+    }
+
 
 class Geoname(object):
-    def __init__(self, quiet=False, force=False):
+    def __init__(self, quiet=False, force=False, batch_size=1000, offline=False, workers=1, dry_run=False,
+                 data_dir=None, defer_indexes=False, pipeline=False, queue_size=4, trace_memory=False):
         self.export_url = {
             'dump': 'http://download.geonames.org/export/dump/',
             'zip': 'http://download.geonames.org/export/zip/'
@@ -134,15 +196,105 @@ class Geoname(object):
                     'timezone',
                     'modificationDate'
                 ]
+            },
+            'modifications': {
+                'file_name': 'modifications-{date}.txt',
+                'urls': [self.export_url['dump'] + '{file_name}', ],
+                'fields': [
+                    'geonameid',
+                    'name',
+                    'asciiName',
+                    'alternateNames',
+                    'latitude',
+                    'longitude',
+                    'featureClass',
+                    'featureCode',
+                    'countryCode',
+                    'cc2',
+                    'admin1Code',
+                    'admin2Code',
+                    'admin3Code',
+                    'admin4Code',
+                    'population',
+                    'elevation',
+                    'gtopo30',
+                    'timezone',
+                    'modificationDate'
+                ]
+            },
+            'deletes': {
+                'file_name': 'deletes-{date}.txt',
+                'urls': [self.export_url['dump'] + '{file_name}', ],
+                'fields': [
+                    'geonameid',
+                    'name',
+                    'comment'
+                ]
+            },
+            'postal_code': {
+                'file_name': 'postalCodes.zip',
+                'remote_name': 'allCountries.zip',
+                'member': 'allCountries.txt',
+                'urls': [self.export_url['zip'] + '{file_name}'],
+                'fields': [
+                    'countryCode',
+                    'postalCode',
+                    'placeName',
+                    'adminName1',
+                    'adminCode1',
+                    'adminName2',
+                    'adminCode2',
+                    'adminName3',
+                    'adminCode3',
+                    'latitude',
+                    'longitude',
+                    'accuracy'
+                ]
             }
         }
 
-        self.data_dir = os.path.join(django_settings.MEDIA_ROOT, 'geoname')
+        # Feature codes of the administrative seats geonames keeps in its cities files regardless of population
+        self.city_seat_codes = ['PPLC', 'PPLA', 'PPLA2', 'PPLA3', 'PPLA4']
+
+        self.data_dir = data_dir or os.path.join(django_settings.MEDIA_ROOT, 'geoname')
         self.quiet = quiet
         self.force = force
+        self.batch_size = batch_size
+        self.offline = offline
+        self.workers = workers
+        self.dry_run = dry_run
+        self.defer_indexes = defer_indexes
+        self.pipeline = pipeline
+        self.queue_size = queue_size
+        self.stages = []
+        self.prefetched = {}
+        self.prefetch_errors = {}
+        self.download_reports = []
+        self.diffs = {}
+        self.telemetry = Telemetry(trace_memory=trace_memory)
+        self.manifest = Manifest(self.data_dir)
+        self.downloader = Downloader(manifest=self.manifest, offline=offline,
+                                     content_types=['text/plain; charset=utf-8', 'application/zip'])
         self.count_country = 0
         self.count_region = 0
         self.count_city = 0
+        self.count_postal_code = 0
+        self.row_count = {}
+        self.hierarchy_changed = False
+        # Whether any import, sync or flush wrote rows, so the derived indexes and snapshot need a rebuild
+        self.data_changed = False
+        self.country_fields = ['name', 'code', 'code3', 'continent', 'tld']
+        self.region_fields = ['name', 'asciiName', 'code', 'country']
+        self.city_fields = ['name', 'asciiName', 'country', 'region', 'location', 'population', 'elevation',
+                            'featureCode', 'timezone']
+        self.postal_code_columns = ['country_id', 'region_id', 'postal_code', 'name', 'location', 'accuracy']
+        # Files each import option reads, in the order they are needed
+        self.import_files = {
+            'country': ['country'],
+            'region': ['region'],
+            'city': ['city500'],
+            'postal_code': ['postal_code']
+        }
 
     def import_options(self):
         return [
@@ -152,58 +304,147 @@ class Geoname(object):
             'city'
         ]
 
-    def __download_file__(self, file_key):
-        if 'file_name' in self.files[file_key]:
-            file_names = [self.files[file_key]['file_name']]
-        else:
-            raise Exception("'file_name' key is missing from %s", self.files[file_key])
+    def prefetch(self, imports):
+        """
+        Download the files of the given import options one after the other in a background thread.
 
-        for file_name in file_names:
-            urls = [e.format(file_name=file_name) for e in self.files[file_key]['urls']]
-            content = None
-            url = None
-            for url in urls:
+        Files needed by later steps then download while earlier ones import, and ``__download_file__`` only waits for
+        the files that are not there yet.
+        """
+        file_keys = [file_key for option in imports for file_key in self.import_files.get(option, [])]
+        self.prefetched = {file_key: threading.Event() for file_key in file_keys}
+
+        def download():
+            for file_key in file_keys:
+                start = time.perf_counter()
                 try:
-                    content = urlopen(url=url)
-                    if content.headers['Content-Type'] not in ['text/plain; charset=utf-8', 'application/zip']:
-                        raise Exception("content type of downloaded file was %s", content.headers['Content-Type'])
-                    logger.debug("Downloaded: %s", url)
+                    self.__fetch_file__(file_key)
                 except Exception as e:
-                    logger.warning(e)
-                    content = None
-                    continue
+                    self.prefetch_errors[file_key] = e
+                finally:
+                    self.download_reports.append({'file_name': self.files[file_key]['file_name'],
+                                                  'seconds': round(time.perf_counter() - start, 3)})
+                    self.prefetched[file_key].set()
 
-            if content is not None:
-                logger.debug("Saving: %s/%s", self.data_dir, file_name)
-                if not os.path.exists(self.data_dir):
-                    os.makedirs(self.data_dir)
+        threading.Thread(target=download, name='prefetch', daemon=True).start()
 
-                with open(os.path.join(self.data_dir, file_name), 'wb') as file:
-                    file.write(content.read())
+    def __stage__(self, name, iterable):
+        """Run ``iterable`` in its own thread behind a bounded queue when pipelining, or inline otherwise"""
+        if not self.pipeline:
+            return iterable
 
-            if not os.path.exists(os.path.join(self.data_dir, file_name)):
-                raise Exception("File not found and download failed: %s [%s]", file_name, url)
+        stage = BoundedStage(name, iterable, maxsize=self.queue_size)
+        self.stages.append(stage)
+        return stage
+
+    def __download_file__(self, file_key):
+        event = self.prefetched.pop(file_key, None)
+        if event is None:
+            self.__fetch_file__(file_key)
+            return
 
-    def __get_data__(self, file_key):
+        if not event.is_set():
+            logger.info("Waiting for the download of %s", self.files[file_key]['file_name'])
+            event.wait()
+        if file_key in self.prefetch_errors:
+            raise self.prefetch_errors.pop(file_key)
+
+    def __fetch_file__(self, file_key):
         if 'file_name' in self.files[file_key]:
             file_names = [self.files[file_key]['file_name']]
         else:
             raise Exception("'file_name' key is missing from %s", self.files[file_key])
 
+        # The postal code archive has the same name as the full dump, so it is stored under a local name
+        remote_name = self.files[file_key].get('remote_name')
+
         for file_name in file_names:
-            name, ext = file_name.rsplit('.', 1)
-            logger.debug("Reading: %s/%s", self.data_dir, file_name)
+            urls = [e.format(file_name=remote_name or file_name) for e in self.files[file_key]['urls']]
+            with self.telemetry.stage('download'):
+                self.downloader.download(file_name=file_name, urls=urls)
+
+    def __get_data__(self, file_key, desc=None, file_name=None, start_row=0):
+        """
+        Stream the rows of a downloaded file exactly once.
 
+        Rows are yielded as named tuples of the file's fields and progress is reported by the number of bytes read,
+        so the file never needs to be counted up front. The number of rows read is kept in ``self.row_count``.
+        Callers should wrap the generator in ``contextlib.closing`` so file handles are released even when the
+        import stops early. ``file_name`` overrides the configured file name, e.g. for dated files, and the first
+        ``start_row`` rows are counted but neither decoded nor yielded. Time spent reading or decompressing and time
+        spent decoding rows are added to the ``read``/``decompress`` and ``parse`` telemetry stages.
+        """
+        if file_name is not None:
+            pass
+        elif 'file_name' in self.files[file_key]:
+            file_name = self.files[file_key]['file_name']
+        else:
+            raise Exception("'file_name' key is missing from %s", self.files[file_key])
+
+        fields = self.files[file_key]['fields']
+        record = namedtuple('Record', fields)
+        empty = [''] * len(fields)
+        name, ext = file_name.rsplit('.', 1)
+        file_path = os.path.join(self.data_dir, file_name)
+        logger.debug("Reading: %s/%s", self.data_dir, file_name)
+
+        self.row_count[file_key] = 0
+        with ExitStack() as stack:
             if ext == 'zip':
-                file_path = os.path.join(self.data_dir, file_name)
-                zip_member = zipfile.ZipFile(file_path).open(name + '.txt', 'r')
-                file_obj = io.TextIOWrapper(zip_member, encoding='utf-8')
+                archive = stack.enter_context(zipfile.ZipFile(file_path))
+                member = archive.getinfo(self.files[file_key].get('member', name + '.txt'))
+                file_obj = stack.enter_context(archive.open(member, 'r'))
+                total_size = member.file_size
             else:
-                file_obj = io.open(os.path.join(self.data_dir, file_name), 'r', encoding='utf-8')
+                file_obj = stack.enter_context(io.open(file_path, 'rb'))
+                total_size = os.path.getsize(file_path)
+
+            progress = stack.enter_context(tqdm(disable=self.quiet, total=total_size, desc=desc, unit='B',
+                                                unit_scale=True))
+
+            read_seconds = 0.0
+            parse_seconds = 0.0
+            parsed = 0
+            try:
+                start = time.perf_counter()
+                for row in file_obj:
+                    read = time.perf_counter()
+                    read_seconds += read - start
+
+                    progress.update(len(row))
+                    if row.startswith(b'#'):
+                        continue
+
+                    self.row_count[file_key] += 1
+                    if self.row_count[file_key] <= start_row:
+                        continue
+
+                    values = row.decode('utf-8').rstrip('\n').split('\t')
+                    if len(values) != len(fields):
+                        values = (values + empty)[:len(fields)]
 
-            for row in file_obj:
-                if not row.startswith('#'):
-                    yield dict(list(zip(self.files[file_key]['fields'], row.rstrip('\n').split('\t'))))
+                    item = record._make(values)
+                    parsed += 1
+                    parse_seconds += time.perf_counter() - read
+                    yield item
+                    start = time.perf_counter()
+            finally:
+                self.telemetry.add('decompress' if ext == 'zip' else 'read', read_seconds,
+                                   rows=self.row_count[file_key])
+                self.telemetry.add('parse', parse_seconds, rows=parsed)
+
+    def __is_up_to_date__(self, file_key, model, kind):
+        """
+        Whether the last successful import used a file byte-identical to the one on disk and the ``model`` table
+        still holds its rows, that is the rows read from the file less the ``kind`` rows skipped
+        """
+        if self.force:
+            return False
+        rows = model.objects.count() + self.__skipped_count_json(read=kind)
+        return self.manifest.is_imported(self.files[file_key]['file_name'], rows=rows)
+
+    def __mark_imported__(self, file_key):
+        self.manifest.mark_imported(self.files[file_key]['file_name'], rows=self.row_count.get(file_key))
 
     def __skipped_count_json(self, read=None):
         if read is not None:
@@ -216,23 +457,51 @@ class Geoname(object):
                 skipped_count = 0
 
             return skipped_count
-        else:
+        elif not self.dry_run:
             count = {
                 "country": self.count_country,
                 "region": self.count_region,
-                "city": self.count_city
+                "city": self.count_city,
+                "postal_code": self.count_postal_code
             }
 
             with open(os.path.join(self.data_dir, "skipped_count.json"), "w+") as fp:
                 json.dump(count, fp)
 
+            # The import report with the timings and skip reasons behind these counts is kept next to them
+            self.telemetry.write(os.path.join(self.data_dir, "import_report.json"))
+
             return None
 
+    def __skip__(self, kind, reason):
+        """Count a skipped row of ``kind`` for ``skipped_count.json`` and its reason for the import report"""
+        setattr(self, 'count_' + kind, getattr(self, 'count_' + kind) + 1)
+        self.telemetry.skip(": ".join([kind, reason]))
+
+    def __bulk_save__(self, model, objs, existing_ids, fields):
+        create = [obj for obj in objs if obj.pk not in existing_ids]
+        update = [obj for obj in objs if obj.pk in existing_ids]
+
+        with transaction.atomic():
+            if create:
+                model.objects.bulk_create(create, batch_size=self.batch_size)
+            if update:
+                model.objects.bulk_update(update, fields=fields, batch_size=self.batch_size)
+        self.data_changed = self.data_changed or bool(objs)
+
+        existing_ids.update(obj.pk for obj in create)
+        logger.debug("Added %d, updated %d %s", len(create), len(update), model._meta.verbose_name_plural.lower())
+
     def import_continent(self):
-        if Continent.objects.count() != len(ContinentEnum.choices()) or self.force:
-            for continent in tqdm(ContinentEnum.choices(), disable=self.quiet, total=len(ContinentEnum.choices()),
-                                  desc="Importing continents"):
-                Continent.objects.update_or_create(code=continent[0], defaults={'name': continent[1]})
+        diff = TableDiff(Continent, ['name'])
+        continents = diff.changed([Continent(code=code, name=name) for code, name in ContinentEnum.choices()])
+        self.diffs['continent'] = diff.report()
+
+        if self.dry_run:
+            return
+
+        if continents:
+            self.__bulk_save__(Continent, continents, set(diff.hashes), ['name'])
         else:
             logger.info("Database is already up-to-date")
 
@@ -240,91 +509,103 @@ class Geoname(object):
         file_key = 'country'
 
         self.__download_file__(file_key=file_key)
-        data = self.__get_data__(file_key=file_key)
-        total_count = sum(1 for _ in data)
-        data = self.__get_data__(file_key=file_key)
 
-        continents = {c.code: c.name for c in Continent.objects.all()}
+        if self.dry_run or not self.__is_up_to_date__(file_key=file_key, model=Country, kind='country'):
+            with self.telemetry.stage('diff'):
+                diff = TableDiff(Country, self.country_fields)
+            countries = []
 
-        if (Country.objects.count() + self.__skipped_count_json(read=file_key)) != total_count or self.force:
-            for item in tqdm(data, disable=self.quiet, total=total_count, desc="Importing countries"):
-                try:
-                    country_id = int(item['geonameid'])
-                except KeyError:
-                    logger.warning('Country has no Geo name ID: %s --skipping' % item['name'])
-                    self.count_country += 1
-                    continue
-                except ValueError:
-                    logger.warning('Country has non-numeric Geo name ID: %s --skipping' % item['geonameid'])
-                    self.count_country += 1
-                    continue
-
-                defaults = {
-                    'name': item['name'],
-                    'code': item['code'],
-                    'code3': item['code3'],
-                    'continent': Continent.objects.get(name=continents[item['continent']]),
-                    'tld': item['tld']
-                }
-
-                country, created = Country.objects.update_or_create(id=country_id, defaults=defaults)
-                logger.debug("%s country '%s'", "Added" if created else "Updated", defaults['name'])
+            with closing(self.__get_data__(file_key=file_key, desc="Importing countries")) as data:
+                for item in data:
+                    try:
+                        country_id = int(item.geonameid)
+                    except ValueError:
+                        logger.warning('Country has non-numeric Geo name ID: %s --skipping' % item.geonameid)
+                        self.__skip__('country', 'non-numeric id')
+                        diff.skip()
+                        continue
+
+                    countries.append(Country(id=country_id, name=item.name, code=item.code, code3=item.code3,
+                                             continent_id=item.continent, tld=item.tld))
+
+            countries = diff.changed(countries)
+            self.diffs[file_key] = diff.report()
+
+            if not self.dry_run:
+                self.hierarchy_changed = True
+                with self.telemetry.stage('write', rows=len(countries)):
+                    self.__bulk_save__(Country, countries, set(diff.hashes), self.country_fields)
+                self.__mark_imported__(file_key=file_key)
         else:
             logger.info("Database is already up-to-date")
 
         self.__skipped_count_json()
 
+    def __load_snapshot__(self):
+        """The area snapshot, unless this run changed countries or regions since it was written"""
+        if self.hierarchy_changed:
+            return None
+        return AreaSnapshot.load_current(self.data_dir)
+
     def __build_country_index__(self):
+        snapshot = self.__load_snapshot__()
+        if snapshot is not None:
+            self.country_index = snapshot.country_index()
+            return
+
         self.country_index = {}
 
-        for obj in tqdm(Country.objects.all(), disable=self.quiet, total=Country.objects.count(),
-                        desc="Building country index"):
-            self.country_index[obj.code] = obj
+        for code, country_id in tqdm(Country.objects.values_list('code', 'id').iterator(), disable=self.quiet,
+                                     total=Country.objects.count(), desc="Building country index"):
+            self.country_index[code] = country_id
 
     def import_region(self):
         file_key = 'region'
 
         self.__download_file__(file_key=file_key)
-        data = self.__get_data__(file_key=file_key)
         self.__build_country_index__()
-        total_count = sum(1 for _ in data)
-        data = self.__get_data__(file_key=file_key)
 
         countries_not_found = {}
 
-        if (Region.objects.count() + self.__skipped_count_json(read=file_key)) != total_count or self.force:
-            for item in tqdm(data, disable=self.quiet, total=total_count, desc="Importing regions"):
-                try:
-                    region_id = int(item['geonameid'])
-                except KeyError:
-                    logger.warning('Region has no Geo name ID: %s --skipping' % item['name'])
-                    self.count_region += 1
-                    continue
-                except ValueError:
-                    logger.warning('Region has non-numeric Geo name ID: %s --skipping' % item['geonameid'])
-                    self.count_region += 1
-                    continue
-
-                country_code, region_code = item['code'].split('.')
-
-                defaults = {
-                    'name': item['name'],
-                    'asciiName': item['asciiName'],
-                    'code': region_code
-                }
+        if self.dry_run or not self.__is_up_to_date__(file_key=file_key, model=Region, kind='region'):
+            with self.telemetry.stage('diff'):
+                diff = TableDiff(Region, self.region_fields)
+            regions = []
 
-                try:
-                    defaults['country'] = self.country_index[country_code]
-                except KeyError:
-                    countries_not_found.setdefault(country_code, []).append(defaults['name'])
-                    logger.warning("Region: %s: Cannot find country: %s --skipping", defaults['name'], country_code)
-                    self.count_region += 1
-                    continue
+            with closing(self.__get_data__(file_key=file_key, desc="Importing regions")) as data:
+                for item in data:
+                    try:
+                        region_id = int(item.geonameid)
+                    except ValueError:
+                        logger.warning('Region has non-numeric Geo name ID: %s --skipping' % item.geonameid)
+                        self.__skip__('region', 'non-numeric id')
+                        diff.skip()
+                        continue
+
+                    country_code, region_code = item.code.split('.')
+
+                    try:
+                        country_id = self.country_index[country_code]
+                    except KeyError:
+                        countries_not_found.setdefault(country_code, []).append(item.name)
+                        logger.warning("Region: %s: Cannot find country: %s --skipping", item.name, country_code)
+                        self.__skip__('region', 'unknown country')
+                        diff.skip()
+                        continue
+
+                    regions.append(Region(id=region_id, name=item.name, asciiName=item.asciiName,
+                                          code=region_code, country_id=country_id))
 
-                region, created = Region.objects.update_or_create(id=region_id, defaults=defaults)
-                logger.debug("%s region: %s, %s", "Added" if created else "Updated", item['code'], region.__str__())
+            regions = diff.changed(regions)
+            self.diffs[file_key] = diff.report()
 
-            if countries_not_found:
+            if not self.dry_run:
+                self.hierarchy_changed = True
+                with self.telemetry.stage('write', rows=len(regions)):
+                    self.__bulk_save__(Region, regions, set(diff.hashes), self.region_fields)
+                self.__mark_imported__(file_key=file_key)
+
+            if countries_not_found and not self.dry_run:
                 countries_not_found_file = os.path.join(self.data_dir, 'countries_not_found.json')
                 try:
                     with open(countries_not_found_file, 'w+') as file_pointer:
@@ -337,81 +618,543 @@ class Geoname(object):
         self.__skipped_count_json()
 
     def __build_region_index__(self):
+        snapshot = self.__load_snapshot__()
+        if snapshot is not None:
+            self.region_index = snapshot.region_index()
+            return
+
         self.region_index = {}
-        for obj in tqdm(Region.objects.all(), disable=self.quiet, total=Region.objects.count(),
-                        desc="Building region index"):
-            self.region_index[obj.full_code()] = obj
+
+        for country_code, code, region_id in tqdm(Region.objects.values_list('country__code', 'code', 'id').iterator(),
+                                                  disable=self.quiet, total=Region.objects.count(),
+                                                  desc="Building region index"):
+            self.region_index[".".join([country_code, code])] = region_id
+
+    def __build_city__(self, item):
+        """Build an unsaved City from a parsed row, or return None when the row has to be skipped"""
+        try:
+            city_id = int(item.geonameid)
+        except ValueError:
+            logger.warning('City has non-numeric Geo name ID: %s --skipping' % item.geonameid)
+            self.__skip__('city', 'non-numeric id')
+            return None
+
+        defaults = {
+            'name': item.name,
+            'asciiName': item.asciiName,
+            'location': Point(float(item.longitude), float(item.latitude))
+        }
+
+        country_code = item.countryCode
+        try:
+            defaults['country_id'] = self.country_index[country_code]
+        except KeyError:
+            logger.warning("City: %s: Cannot find country: %s --skipping", item.name, country_code)
+            self.__skip__('city', 'unknown country')
+            return None
+
+        region_code = item.admin1Code
+        try:
+            defaults['region_id'] = self.region_index[country_code + '.' + region_code]
+        except KeyError:
+            logger.warning("City: %s: Cannot find region: %s --skipping", item.name, region_code)
+            self.__skip__('city', 'unknown region')
+            return None
+
+        defaults['featureCode'] = item.featureCode
+        defaults['timezone'] = item.timezone
+        try:
+            defaults['population'] = int(item.population or 0)
+        except ValueError:
+            defaults['population'] = 0
+        try:
+            defaults['elevation'] = int(item.elevation) if item.elevation else None
+        except ValueError:
+            defaults['elevation'] = None
+
+        city = City(id=city_id, **defaults)
+        city.alternate_names_list = []
+        city.normalized_names = []
+        for name in [item.name, item.asciiName] + item.alternateNames.split(','):
+            normalized = normalize_name(name)[:200]
+            if normalized and normalized not in city.normalized_names:
+                city.alternate_names_list.append(name[:200])
+                city.normalized_names.append(normalized)
+
+        return city
+
+    def __save_cities__(self, cities, existing_ids):
+        """Bulk write a batch of cities and replace their alternate names in the same transaction"""
+        alternate_names = [CityAlternateName(city_id=city.pk, name=name, normalized=normalized) for city in cities
+                           for name, normalized in zip(city.alternate_names_list, city.normalized_names)]
+
+        with transaction.atomic():
+            self.__bulk_save__(City, cities, existing_ids, self.city_fields)
+            CityAlternateName.objects.filter(city_id__in=[city.pk for city in cities]).delete()
+            CityAlternateName.objects.bulk_create(alternate_names, batch_size=self.batch_size)
+
+    def __sync_state_json(self, file_key, date=None):
+        """Read or store the date of the last geonames modification applied to the data of ``file_key``"""
+        json_file = os.path.join(self.data_dir, "sync_state.json")
+
+        try:
+            with open(json_file, "r") as fp:
+                sync_state = json.load(fp)
+        except FileNotFoundError:
+            sync_state = {}
+
+        if date is None:
+            last_date = sync_state.get(file_key)
+            return datetime.strptime(last_date, '%Y-%m-%d').date() if last_date else None
+
+        sync_state[file_key] = date.strftime('%Y-%m-%d')
+        with open(json_file, "w+") as fp:
+            json.dump(sync_state, fp)
+
+        return None
+
+    def __checkpoint_json(self, file_key, checkpoint=None, clear=False):
+        """Read, store or clear the position of the last batch committed while importing ``file_key``"""
+        json_file = os.path.join(self.data_dir, "checkpoint.json")
+
+        try:
+            with open(json_file, "r") as fp:
+                checkpoints = json.load(fp)
+        except FileNotFoundError:
+            checkpoints = {}
+
+        if checkpoint is None and not clear:
+            return checkpoints.get(file_key)
+
+        if clear:
+            checkpoints.pop(file_key, None)
+        else:
+            checkpoints[file_key] = checkpoint
+
+        with open(json_file, "w+") as fp:
+            json.dump(checkpoints, fp)
+
+        return None
+
+    def __import_city_serial__(self, file_key):
+        """
+        Import the cities in transactional batches of ``self.batch_size`` rows.
+
+        After each batch is committed the number of rows consumed is saved in ``checkpoint.json`` together with the
+        hash of the file, so an interrupted import of the same file resumes after the last committed batch. A dry run
+        writes nothing and so always reads the whole file.
+        """
+        sha256 = self.manifest.get(self.files[file_key]['file_name']).get('sha256')
+        checkpoint = None if self.dry_run else self.__checkpoint_json(file_key)
+        diff = self.city_diff
+
+        if checkpoint and checkpoint['sha256'] == sha256:
+            logger.info("Resuming city import after row %d", checkpoint['row'])
+            start_row = checkpoint['row']
+            last_modified = checkpoint['last_modified']
+            self.count_city = checkpoint['skipped']
+            # The rows before the checkpoint are not read again, so which cities are gone from the file is unknown
+            diff.seen.update(diff.hashes)
+        else:
+            start_row = 0
+            last_modified = ''
+
+        existing_ids = set(diff.hashes)
+
+        def batches(last_modified):
+            """Parse and build the cities, yielding each batch with the checkpoint to store once it is written"""
+            batch = []
+            skipped = 0
+            resolve_seconds = 0.0
+
+            with closing(self.__get_data__(file_key=file_key, desc="Importing cities", start_row=start_row)) as data:
+                for item in data:
+                    last_modified = max(last_modified, item.modificationDate)
+
+                    start = time.perf_counter()
+                    city = self.__build_city__(item)
+                    resolve_seconds += time.perf_counter() - start
+                    if city is not None:
+                        batch.append(city)
+                    else:
+                        skipped += 1
+
+                    if len(batch) >= self.batch_size:
+                        self.telemetry.add('resolve', resolve_seconds, rows=len(batch) + skipped)
+                        resolve_seconds = 0.0
+                        yield batch, skipped, {
+                            'row': self.row_count[file_key],
+                            'sha256': sha256,
+                            'last_modified': last_modified,
+                            'skipped': self.count_city
+                        }
+                        batch = []
+                        skipped = 0
+
+            self.telemetry.add('resolve', resolve_seconds, rows=len(batch) + skipped)
+            yield batch, skipped, {
+                'row': self.row_count[file_key],
+                'sha256': sha256,
+                'last_modified': last_modified,
+                'skipped': self.count_city
+            }
+
+        for batch, skipped, checkpoint in self.__stage__("Parsing cities", batches(last_modified)):
+            diff.skip(skipped)
+            changed = diff.changed(batch)
+            last_modified = checkpoint['last_modified']
+            if self.dry_run:
+                continue
+
+            if changed:
+                with self.telemetry.stage('write', rows=len(changed)):
+                    self.__save_cities__(changed, existing_ids)
+            self.__checkpoint_json(file_key, checkpoint=checkpoint)
+
+        if not self.dry_run:
+            self.__checkpoint_json(file_key, clear=True)
+        return last_modified
+
+    def __import_city_parallel__(self, file_key):
+        """
+        Partition the city rows by country code and import each partition in a pool of ``self.workers`` processes.
+
+        The parent only parses the file and dispatches batches of rows; workers build and bulk write the cities on
+        their own database connection and report back the skipped rows, diff counts and telemetry of every batch,
+        which are merged into the parent's so a parallel run reports the same numbers as a serial one. At most a few
+        batches per worker are kept in flight so memory stays bounded when the workers fall behind.
+        """
+        last_modified = ''
+        partitions = {}
+        pending = deque()
+        max_pending = self.workers * 4
+
+        # Forked workers must not share the parent's database connection
+        connections.close_all()
+
+        with Pool(processes=self.workers, initializer=_init_city_worker,
+                  initargs=(self.files[file_key]['fields'], self.country_index, self.region_index,
+                            self.city_diff, self.batch_size)) as pool, \
+                tqdm(disable=self.quiet, desc="Writing cities", unit=' rows') as progress:
+            def collect(result):
+                report = result.get()
+                self.count_city += report['skipped']
+                self.city_diff.merge(report['counts'], report['seen'])
+                if report['counts']['inserted'] or report['counts']['updated']:
+                    self.data_changed = True
+                self.telemetry.merge(report['stages'], report['skip_reasons'])
+                progress.update(report['rows'])
+
+            with closing(self.__get_data__(file_key=file_key, desc="Reading cities")) as data:
+                for item in data:
+                    last_modified = max(last_modified, item.modificationDate)
+
+                    partition = partitions.setdefault(item.countryCode, [])
+                    partition.append(tuple(item))
+                    if len(partition) >= self.batch_size:
+                        pending.append(pool.apply_async(_import_city_rows, (partition,)))
+                        partitions[item.countryCode] = []
+
+                    while len(pending) > max_pending:
+                        collect(pending.popleft())
+
+            for partition in partitions.values():
+                if partition:
+                    pending.append(pool.apply_async(_import_city_rows, (partition,)))
+
+            while pending:
+                collect(pending.popleft())
+
+        self.__checkpoint_json(file_key, clear=True)
+        return last_modified
 
     def import_city(self, population=500):
         file_key = 'city{}'.format(population)
 
         self.__download_file__(file_key=file_key)
-        data = self.__get_data__(file_key=file_key)
         self.__build_country_index__()
         self.__build_region_index__()
-        total_count = sum(1 for _ in data)
-        data = self.__get_data__(file_key=file_key)
 
-        if (City.objects.count() + self.__skipped_count_json(read=file_key)) != total_count or self.force:
-            for item in tqdm(data, disable=self.quiet, total=total_count, desc="Importing cities"):
-                try:
-                    city_id = int(item['geonameid'])
-                except KeyError:
-                    logger.warning('City has no Geo name ID: %s --skipping' % item['name'])
-                    self.count_city += 1
-                    continue
-                except ValueError:
-                    logger.warning('City has non-numeric Geo name ID: %s --skipping' % item['geonameid'])
-                    self.count_city += 1
-                    continue
-
-                defaults = {
-                    'name': item['name'],
-                    'asciiName': item['asciiName'],
-                    'location': Point(float(item['latitude']), float(item['longitude']))
-                }
-
-                country_code = item['countryCode']
-                try:
-                    country = Country.objects.get(name=self.country_index[country_code])
-                    defaults['country'] = country
-                except KeyError:
-                    logger.warning("City: %s: Cannot find country: %s --skipping", item['name'], country_code)
-                    self.count_city += 1
-                    continue
-
-                region_code = item['admin1Code']
-                try:
-                    region_key = country_code + '.' + region_code
-                    region = Region.objects.filter(name=self.region_index[region_key]).distinct().first()
-                    defaults['region'] = region
-                except KeyError:
-                    logger.warning("City: %s: Cannot find region: %s --skipping", item['name'], region_code)
-                    self.count_city += 1
-                    continue
-
-                city, created = City.objects.update_or_create(id=city_id, defaults=defaults)
-                logger.debug("%s city: %s", "Added" if created else "Updated", city.__str__())
+        if self.dry_run or not self.__is_up_to_date__(file_key=file_key, model=City, kind='city'):
+            with self.telemetry.stage('diff'):
+                self.city_diff = TableDiff(City, self.city_fields, annotations={
+                    'alternate_names_list': ArrayAgg('alternate_names__name', filter=Q(alternate_names__isnull=False))
+                })
+
+            with ExitStack() as stack:
+                if self.defer_indexes and not self.dry_run:
+                    stack.enter_context(deferred_indexes(
+                            City, CityAlternateName, keep=[CityAlternateName._meta.get_field('city')]
+                    ))
+
+                if self.workers > 1 and not self.dry_run:
+                    last_modified = self.__import_city_parallel__(file_key=file_key)
+                else:
+                    last_modified = self.__import_city_serial__(file_key=file_key)
+                self.diffs[file_key] = self.city_diff.report()
+
+            if self.dry_run:
+                return
+
+            self.__mark_imported__(file_key=file_key)
+            if last_modified:
+                self.__sync_state_json(file_key, date=datetime.strptime(last_modified, '%Y-%m-%d').date())
         else:
             logger.info("Database is already up-to-date")
         self.__skipped_count_json()
 
+    def sync_city(self, population=500):
+        """
+        Apply the daily geonames ``modifications-YYYY-MM-DD.txt`` and ``deletes-YYYY-MM-DD.txt`` files found in the
+        data directory to the city table, starting the day after the last applied date.
+
+        A modified row is kept when it would appear in the ``cities<population>`` file, that is a populated place
+        with at least ``population`` inhabitants or an administrative seat; cities that no longer qualify are
+        removed. Days are applied in order and each one in its own transaction, so the sync stops at the first
+        missing file and resumes from there on the next run.
+        """
+        file_key = 'city{}'.format(population)
+
+        last_date = self.__sync_state_json(file_key)
+        if last_date is None:
+            logger.warning("No geonames sync state for '%s', run a full city import first", file_key)
+            return
+
+        self.__build_country_index__()
+        self.__build_region_index__()
+
+        date = last_date + timedelta(days=1)
+        while date < datetime.utcnow().date():
+            date_str = date.strftime('%Y-%m-%d')
+            file_names = {
+                key: self.files[key]['file_name'].format(date=date_str) for key in ['modifications', 'deletes']
+            }
+
+            missing = [name for name in file_names.values() if not os.path.exists(os.path.join(self.data_dir, name))]
+            if missing:
+                logger.warning("Geonames sync stopped at %s, missing: %s", date_str, ", ".join(missing))
+                break
+
+            cities = []
+            deleted_ids = set()
+
+            with closing(self.__get_data__(file_key='modifications', desc="Applying modifications %s" % date_str,
+                                           file_name=file_names['modifications'])) as data:
+                for item in data:
+                    if item.featureClass != 'P':
+                        continue
+
+                    try:
+                        qualifies = int(item.population or 0) >= population or item.featureCode in self.city_seat_codes
+                    except ValueError:
+                        qualifies = False
+
+                    if not qualifies:
+                        if item.geonameid.isdigit():
+                            deleted_ids.add(int(item.geonameid))
+                        continue
+
+                    city = self.__build_city__(item)
+                    if city is not None:
+                        cities.append(city)
+
+            with closing(self.__get_data__(file_key='deletes', desc="Applying deletes %s" % date_str,
+                                           file_name=file_names['deletes'])) as data:
+                deleted_ids.update(int(item.geonameid) for item in data if item.geonameid.isdigit())
+
+            existing_ids = set(City.objects.filter(id__in=[city.pk for city in cities]).values_list('id', flat=True))
+
+            with transaction.atomic():
+                for index in range(0, len(cities), self.batch_size):
+                    self.__save_cities__(cities[index:index + self.batch_size], existing_ids)
+                deleted, _ = City.objects.filter(id__in=deleted_ids).delete()
+                self.__sync_state_json(file_key, date=date)
+            self.data_changed = self.data_changed or bool(cities or deleted)
+
+            logger.info("Applied geonames changes of %s: %d cities updated, %d removed", date_str, len(cities),
+                        deleted)
+            date += timedelta(days=1)
+
+        self.__skipped_count_json()
+
+    def __build_postal_code__(self, item):
+        """Build an unsaved PostalCode from a parsed row, or return None when the row has to be skipped"""
+        try:
+            country_id = self.country_index[item.countryCode]
+        except KeyError:
+            logger.debug("Postal code: %s: Cannot find country: %s --skipping", item.postalCode, item.countryCode)
+            self.__skip__('postal_code', 'unknown country')
+            return None
+
+        try:
+            location = Point(float(item.longitude), float(item.latitude), srid=4326)
+        except ValueError:
+            location = None
+
+        return PostalCode(country_id=country_id,
+                          region_id=self.region_index.get(item.countryCode + '.' + item.adminCode1),
+                          postal_code=item.postalCode.strip().upper()[:20], name=item.placeName[:180],
+                          location=location, accuracy=int(item.accuracy) if item.accuracy.isdigit() else None)
+
+    def import_postal_code(self):
+        """
+        Bring the postal codes in line with the geonames postal code export.
+
+        Postal codes have no id of their own, so rows are compared on all their columns. The export is first copied
+        into a temporary staging table, ``self.batch_size`` rows at a time while they stream out of the archive,
+        without touching the live table. The rows only found in one of both tables are then deleted and inserted in
+        one short transaction. Plain deletes and inserts never lock out readers, so lookups keep being served the old
+        rows until it commits. Identical rows are paired up by their rank among their duplicates, so an unchanged
+        code listed twice stays unchanged. A changed row counts as one inserted and one missing row. Regions are
+        matched on the first level administrative code and left empty where the postal export uses other codes than
+        geonames.
+        """
+        file_key = 'postal_code'
+
+        self.__download_file__(file_key=file_key)
+        self.__build_country_index__()
+        self.__build_region_index__()
+
+        if not self.dry_run and self.__is_up_to_date__(file_key=file_key, model=PostalCode, kind='postal_code'):
+            logger.info("Database is already up-to-date")
+            return
+
+        report = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0, 'missing': 0}
+
+        def batches():
+            batch = []
+            skipped = 0
+            resolve_seconds = 0.0
+
+            with closing(self.__get_data__(file_key=file_key, desc="Importing postal codes")) as data:
+                for item in data:
+                    start = time.perf_counter()
+                    postal_code = self.__build_postal_code__(item)
+                    resolve_seconds += time.perf_counter() - start
+                    if postal_code is None:
+                        skipped += 1
+                        continue
+
+                    batch.append(postal_code)
+                    if len(batch) >= self.batch_size:
+                        self.telemetry.add('resolve', resolve_seconds, rows=len(batch) + skipped)
+                        resolve_seconds = 0.0
+                        yield batch, skipped
+                        batch = []
+                        skipped = 0
+
+            self.telemetry.add('resolve', resolve_seconds, rows=len(batch) + skipped)
+            yield batch, skipped
+
+        def copy_value(value):
+            return '\\N' if value is None else str(value).replace('\\', '\\\\')
+
+        tables = {
+            'table': connection.ops.quote_name(PostalCode._meta.db_table),
+            'columns': ', '.join(self.postal_code_columns),
+            'key': "md5(ROW(country_id, region_id, postal_code, name, ST_AsEWKB(location), accuracy)::text)"
+        }
+        staged_only = """
+            FROM postal_code_staged staged
+            WHERE NOT EXISTS (SELECT 1 FROM postal_code_live live WHERE live.key = staged.key AND live.n = staged.n)
+        """
+        live_only = """
+            FROM postal_code_live live
+            WHERE NOT EXISTS (SELECT 1 FROM postal_code_staged staged WHERE staged.key = live.key AND staged.n = live.n)
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS postal_code_staging, postal_code_staged, postal_code_live")
+            try:
+                cursor.execute("CREATE TEMPORARY TABLE postal_code_staging AS SELECT {columns} FROM {table} "
+                               "WITH NO DATA".format(**tables))
+
+                for batch, skipped in self.__stage__("Parsing postal codes", batches()):
+                    report['skipped'] += skipped
+                    if not batch:
+                        continue
+
+                    rows = io.StringIO()
+                    for postal_code in batch:
+                        location = postal_code.location.hexewkb.decode('ascii') if postal_code.location else None
+                        rows.write('\t'.join(copy_value(value) for value in [
+                            postal_code.country_id, postal_code.region_id, postal_code.postal_code, postal_code.name,
+                            location, postal_code.accuracy
+                        ]) + '\n')
+                    rows.seek(0)
+                    with self.telemetry.stage('load', rows=len(batch)):
+                        cursor.copy_expert("COPY postal_code_staging ({columns}) FROM STDIN".format(**tables), rows)
+
+                with self.telemetry.stage('diff'):
+                    cursor.execute("""
+                        CREATE TEMPORARY TABLE postal_code_staged AS
+                        SELECT {columns}, key, row_number() OVER (PARTITION BY key) AS n
+                        FROM (SELECT *, {key} AS key FROM postal_code_staging) rows
+                    """.format(**tables))
+                    cursor.execute("""
+                        CREATE TEMPORARY TABLE postal_code_live AS
+                        SELECT id, key, row_number() OVER (PARTITION BY key ORDER BY id) AS n
+                        FROM (SELECT id, {key} AS key FROM {table}) rows
+                    """.format(**tables))
+                    cursor.execute("CREATE INDEX ON postal_code_staged (key, n)")
+                    cursor.execute("CREATE INDEX ON postal_code_live (key, n)")
+                    cursor.execute("ANALYZE postal_code_staged, postal_code_live")
+
+                    cursor.execute("SELECT count(*) " + staged_only)
+                    report['inserted'] = cursor.fetchone()[0]
+                    cursor.execute("SELECT count(*) " + live_only)
+                    report['missing'] = cursor.fetchone()[0]
+                    cursor.execute("SELECT count(*) FROM postal_code_staged")
+                    report['unchanged'] = cursor.fetchone()[0] - report['inserted']
+
+                if not self.dry_run and (report['inserted'] or report['missing']):
+                    with transaction.atomic(), \
+                            self.telemetry.stage('write', rows=report['inserted'] + report['missing']):
+                        cursor.execute("DELETE FROM {table} WHERE id IN (SELECT live.id ".format(**tables) +
+                                       live_only + ")")
+                        cursor.execute("INSERT INTO {table} ({columns}) SELECT {columns} ".format(**tables) +
+                                       staged_only)
+                    self.data_changed = True
+            finally:
+                cursor.execute("DROP TABLE IF EXISTS postal_code_staging, postal_code_staged, postal_code_live")
+
+        self.diffs[file_key] = report
+        if not self.dry_run:
+            self.__mark_imported__(file_key=file_key)
+            self.__skipped_count_json()
+
+    def __clear_imported__(self, *file_keys):
+        for file_key in file_keys:
+            self.manifest.clear_imported(self.files[file_key]['file_name'])
+            self.__checkpoint_json(file_key, clear=True)
+
+    def __flush__(self, model, *file_keys):
+        """Empty ``model`` and everything cascading from it, or only count the rows when running dry"""
+        counts = flush_models(model, dry_run=self.dry_run)
+        if not self.dry_run:
+            if model in (Continent, Country, Region):
+                self.hierarchy_changed = True
+            self.data_changed = self.data_changed or any(counts.values())
+            self.__clear_imported__(*file_keys)
+            self.__skipped_count_json()
+        return counts
+
     def flush_continent(self):
         logger.info("Flushing continent data")
-        Continent.objects.all().delete()
-        self.__skipped_count_json()
+        return self.__flush__(Continent, 'country')
 
     def flush_country(self):
         logger.info("Flushing country data")
-        Country.objects.all().delete()
-        self.__skipped_count_json()
+        return self.__flush__(Country, 'country', 'region', 'city500', 'city1000', 'city15000', 'postal_code')
 
     def flush_region(self):
         logger.info("Flushing region data")
-        Region.objects.all().delete()
-        self.__skipped_count_json()
+        return self.__flush__(Region, 'region', 'city500', 'city1000', 'city15000')
 
     def flush_city(self):
         logger.info("Flushing city data")
-        City.objects.all().delete()
-        self.__skipped_count_json()
+        return self.__flush__(City, 'city500', 'city1000', 'city15000')
+
+    def flush_postal_code(self):
+        logger.info("Flushing postal code data")
+        return self.__flush__(PostalCode, 'postal_code')
@@ -1,15 +1,29 @@
 #  Copyright (c) 2019 - 2019. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
 
 from django.contrib import admin
+from django.db.models import Q
 
 from artist.models import Artist
+from common.paginator import EstimatedCountPaginator
 
 
 # Register your models here.
 @admin.register(Artist)
 class ArtistAdmin(admin.ModelAdmin):
-	list_display = ('id', 'name')
+	list_display = ('id', 'name', 'city')
 	list_display_links = None
+	list_select_related = ('city',)
+	raw_id_fields = ('city', 'region', 'country')
+	ordering = ('pk',)
+	search_fields = ('name',)
+	paginator = EstimatedCountPaginator
+	show_full_result_count = False
 
 	def has_add_permission(self, request):
 		return False
+
+	def get_search_results(self, request, queryset, search_term):
+		"""Match an artist id or the beginning of a name, both served by an index"""
+		if not search_term:
+			return queryset, False
+		return queryset.filter(Q(pk=search_term) | Q(name__startswith=search_term)), False
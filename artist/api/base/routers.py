@@ -0,0 +1,9 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+from rest_framework import routers
+
+from artist.api.base.views import ArtistAreaViewSet
+
+router = routers.DefaultRouter()
+router.register(r'area', ArtistAreaViewSet, basename='area')
+
+api_urlpatterns = router.urls
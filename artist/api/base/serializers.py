@@ -0,0 +1,20 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+from rest_framework import serializers
+
+from area.enums import AreaKindEnum
+from artist.models import Artist
+
+
+class ArtistAreaQuerySerializer(serializers.Serializer):
+	kind = serializers.ChoiceField(choices=AreaKindEnum.choices())
+	id = serializers.IntegerField()
+	limit = serializers.IntegerField(min_value=1, max_value=200, default=50)
+
+
+class ArtistSerializer(serializers.ModelSerializer):
+	latitude = serializers.FloatField(source='location.y', read_only=True, default=None)
+	longitude = serializers.FloatField(source='location.x', read_only=True, default=None)
+
+	class Meta:
+		model = Artist
+		fields = ['id', 'name', 'artist_mbid', 'latitude', 'longitude', 'city', 'region', 'country']
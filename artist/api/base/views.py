@@ -0,0 +1,21 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+from rest_framework import permissions, viewsets
+from rest_framework.response import Response
+
+from artist.api.base.serializers import ArtistAreaQuerySerializer, ArtistSerializer
+from artist.models import Artist
+
+
+# Create your views here.
+class ArtistAreaViewSet(viewsets.ViewSet):
+	"""Artists from the city, region or country ``id`` of the given ``kind``, by name"""
+	permission_classes = [permissions.AllowAny]
+	throttle_classes = []
+
+	def list(self, request, *args, **kwargs):
+		query = ArtistAreaQuerySerializer(data=request.query_params)
+		query.is_valid(raise_exception=True)
+		params = query.validated_data
+
+		artists = Artist.objects.in_area(params['kind'], params['id'])[:params['limit']]
+		return Response(ArtistSerializer(artists, many=True).data)
@@ -32,6 +32,46 @@ class Command(BaseCommand):
 				help='Selectively import data into the database'
 		)
 
+		parser.add_argument(
+				'--batch-size',
+				default=1000,
+				type=int,
+				dest='batch_size',
+				help='Number of rows written to the database per query'
+		)
+
+		parser.add_argument(
+				'--offline',
+				action='store_true',
+				default=False,
+				dest='offline',
+				help='Import the local copy of the files without downloading them'
+		)
+
+		parser.add_argument(
+				'--dry-run',
+				action='store_true',
+				default=False,
+				dest='dry_run',
+				help='Report the rows that would change without writing to the database'
+		)
+
+		parser.add_argument(
+				'--trace-memory',
+				action='store_true',
+				default=False,
+				dest='trace_memory',
+				help='Trace the peak memory of Python allocations for the import report, which slows the import down'
+		)
+
+		parser.add_argument(
+				'--log-metrics',
+				action='store_true',
+				default=False,
+				dest='log_metrics',
+				help='Log the timings of every import stage to the metrics logger'
+		)
+
 		parser.add_argument(
 				'--quiet',
 				action='store_true',
@@ -46,15 +86,23 @@ class Command(BaseCommand):
 		self.flush = self.options['flush']
 		self.imports = self.options['import']
 		self.quiet = self.options['quiet']
+		self.offline = self.options['offline']
+		self.dry_run = self.options['dry_run']
+		self.batch_size = self.options['batch_size']
+		self.trace_memory = self.options['trace_memory']
+		self.log_metrics = self.options['log_metrics']
 
-		artists = Artists(quiet=self.quiet, force=self.force)
+		artists = Artists(quiet=self.quiet, force=self.force, offline=self.offline, dry_run=self.dry_run,
+		                  trace_memory=self.trace_memory, batch_size=self.batch_size)
 
 		self.flushes = [e for e in self.flush.split(',') if e]
 		if 'all' in self.flushes:
 			self.flushes = artists.import_options()
 		for flush in self.flushes:
 			func = getattr(artists, "flush_" + flush)
-			func()
+			counts = func()
+			for label, count in counts.items():
+				self.stdout.write("%s %d %s rows" % ("Would delete" if self.dry_run else "Deleted", count, label))
 
 		self.imports = [e for e in self.imports.split(',') if e]
 		if 'all' in self.imports:
@@ -64,3 +112,11 @@ class Command(BaseCommand):
 		for imports in self.imports:
 			func = getattr(artists, "import_" + imports)
 			func()
+
+		for key, report in artists.diffs.items():
+			self.stdout.write("%s: %d inserted, %d updated, %d unchanged, %d skipped, %d not in the file" % (
+					key, report['inserted'], report['updated'], report['unchanged'], report['skipped'],
+					report['missing']))
+
+		if self.log_metrics:
+			artists.telemetry.log('artist')
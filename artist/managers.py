@@ -0,0 +1,15 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+from django.db import models
+
+from area.enums import AreaKindEnum
+
+
+class ArtistManager(models.Manager):
+
+	def in_area(self, kind, area_id):
+		"""Artists located in the city, region or country ``area_id`` by name, served by the ``(area, name)`` index"""
+		if kind not in AreaKindEnum.__members__:
+			raise ValueError("Unknown area kind: %s" % kind)
+
+		return self.filter(**{kind + '_id': area_id}).order_by('name')
@@ -0,0 +1,22 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('artist', '0002_artist_name_prefix_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='artist_mbid',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=36),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='track_id',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=18),
+        ),
+    ]
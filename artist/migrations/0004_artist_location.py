@@ -0,0 +1,53 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('area', '0006_integer_primary_keys'),
+        ('artist', '0003_artist_mbid_track_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artist',
+            name='location',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='city',
+            field=models.ForeignKey(blank=True, db_index=False, null=True,
+                                    on_delete=django.db.models.deletion.SET_NULL, related_name='artists',
+                                    to='area.City'),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='region',
+            field=models.ForeignKey(blank=True, db_index=False, null=True,
+                                    on_delete=django.db.models.deletion.SET_NULL, related_name='artists',
+                                    to='area.Region'),
+        ),
+        migrations.AddField(
+            model_name='artist',
+            name='country',
+            field=models.ForeignKey(blank=True, db_index=False, null=True,
+                                    on_delete=django.db.models.deletion.SET_NULL, related_name='artists',
+                                    to='area.Country'),
+        ),
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(fields=['city', 'name'], name='artist_city_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(fields=['region', 'name'], name='artist_region_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artist',
+            index=models.Index(fields=['country', 'name'], name='artist_country_name_idx'),
+        ),
+    ]
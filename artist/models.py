@@ -1,15 +1,35 @@
 #  Copyright (c) 2019 - 2019. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
 
-from django.db import models
+from django.contrib.gis.db import models
+
+from artist.managers import ArtistManager
 
 
 # Create your models here.
 class Artist(models.Model):
 	id = models.CharField(max_length=200, db_index=True, primary_key=True)
 	name = models.CharField(max_length=500, db_index=True)
+	artist_mbid = models.CharField(max_length=36, blank=True, default='', db_index=True)
+	track_id = models.CharField(max_length=18, blank=True, default='', db_index=True)
+	location = models.PointField(null=True, blank=True)
+	# Nearest city of the location and its region and country, each indexed together with the name below
+	city = models.ForeignKey(to='area.City', related_name='artists', on_delete=models.SET_NULL, null=True,
+	                         blank=True, db_index=False)
+	region = models.ForeignKey(to='area.Region', related_name='artists', on_delete=models.SET_NULL, null=True,
+	                           blank=True, db_index=False)
+	country = models.ForeignKey(to='area.Country', related_name='artists', on_delete=models.SET_NULL, null=True,
+	                            blank=True, db_index=False)
+
+	objects = ArtistManager()
 
 	class Meta:
 		ordering = ['name']
+		indexes = [
+				models.Index(fields=['name'], name='artist_name_prefix_idx', opclasses=['varchar_pattern_ops']),
+				models.Index(fields=['city', 'name'], name='artist_city_name_idx'),
+				models.Index(fields=['region', 'name'], name='artist_region_name_idx'),
+				models.Index(fields=['country', 'name'], name='artist_country_name_idx')
+		]
 		verbose_name = 'Artist'
 		verbose_name_plural = 'Artists'
 
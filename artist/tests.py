@@ -1,3 +1,87 @@
 #  Copyright (c) 2019 - 2019. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import os
+import shutil
+import tempfile
+
+from django.contrib.gis.geos import Point
+from django.test import TestCase
+from django.urls import reverse
+
+from area.models import City, Country, Region
+from artist.models import Artist
+from artist.utils import Artists
+from common.benchmark import SyntheticData
+
 
 # Create your tests here.
+class ArtistsTestCase(TestCase):
+	def setUp(self):
+		self.data_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.data_dir)
+		SyntheticData(seed=1).write_msd(self.data_dir, artists=25)
+
+		file_path = os.path.join(self.data_dir, 'unique_artists.txt')
+		with open(file_path, encoding='utf-8') as file_obj:
+			self.first = file_obj.readline()
+		with open(file_path, 'a', encoding='utf-8') as file_obj:
+			file_obj.write(self.first.replace('<SEP>', '<SEP>duplicate ', 1))
+
+	def test_import_artist(self):
+		artists = Artists(quiet=True, offline=True, data_dir=self.data_dir, batch_size=10)
+		artists.import_artist()
+
+		self.assertEqual(Artist.objects.count(), 25)
+		self.assertDictEqual(artists.diffs['artist'], {'inserted': 25, 'updated': 0, 'unchanged': 0, 'skipped': 1,
+		                                               'missing': 0})
+		artist_id, artist_mbid, track_id, name = self.first.rstrip('\n').split('<SEP>')
+		artist = Artist.objects.get(pk=artist_id)
+		self.assertEqual((artist.name, artist.artist_mbid, artist.track_id), (name, artist_mbid, track_id))
+
+		Artist.objects.filter(pk=artist_id).update(name='renamed')
+		artists = Artists(quiet=True, offline=True, force=True, data_dir=self.data_dir, batch_size=10)
+		artists.import_artist()
+		self.assertEqual(artists.diffs['artist']['updated'], 1)
+		self.assertEqual(Artist.objects.get(pk=artist_id).name, name)
+
+	def test_import_artist_location(self):
+		country = Country.objects.create(id=1, name='France', code='FR', code3='FRA', tld='.fr')
+		region = Region.objects.create(id=2, code='11', name='Île-de-France', asciiName='Ile-de-France',
+		                               country=country)
+		paris = City.objects.create(id=3, name='Paris', asciiName='Paris', country=country, region=region,
+		                            location=Point(2.35, 48.85))
+		City.objects.create(id=4, name='Lyon', asciiName='Lyon', country=country, location=Point(4.83, 45.76))
+
+		artist_id = self.first.split('<SEP>')[0]
+		with open(os.path.join(self.data_dir, 'artist_location.txt'), 'w', encoding='utf-8') as file_obj:
+			file_obj.write('<SEP>'.join([artist_id, '48.9', '2.3', 'name', 'Paris']) + '\n')
+			file_obj.write('<SEP>'.join(['ARUNKNOWN', '48.9', '2.3', 'name', 'Paris']) + '\n')
+
+		artists = Artists(quiet=True, offline=True, data_dir=self.data_dir)
+		artists.import_artist()
+		artists.import_artist_location()
+		self.assertEqual(artists.diffs['artist_location']['updated'], 1)
+		self.assertEqual(artists.diffs['artist_location']['skipped'], 1)
+
+		artist = Artist.objects.get(pk=artist_id)
+		self.assertEqual((artist.city_id, artist.region_id, artist.country_id), (paris.pk, region.pk, country.pk))
+		self.assertEqual(artists.link_artist_location(), 0)
+
+		response = self.client.get(reverse('artist:area-list'), {'kind': 'region', 'id': region.pk})
+		self.assertEqual(response.status_code, 200)
+		self.assertListEqual([item['id'] for item in response.data], [artist_id])
+
+		# Across the antimeridian the nearest city is a few kilometres away, not 360 degrees
+		fiji = City.objects.create(id=5, name='Fiji', asciiName='Fiji', country=country,
+		                           location=Point(-179.99, -16.5))
+		Artist.objects.filter(pk=artist_id).update(location=Point(179.99, -16.5))
+		self.assertEqual(artists.link_artist_location(), 1)
+		self.assertEqual(Artist.objects.get(pk=artist_id).city_id, fiji.pk)
+
+		fiji.delete()
+		self.assertIsNone(Artist.objects.get(pk=artist_id).city_id)
+
+		# Out at sea no city is close enough to link
+		Artist.objects.filter(pk=artist_id).update(location=Point(-140, 0))
+		artists.link_artist_location()
+		artist = Artist.objects.get(pk=artist_id)
+		self.assertEqual((artist.city_id, artist.region_id, artist.country_id), (None, None, None))
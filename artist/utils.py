@@ -3,18 +3,27 @@
 import io
 import logging
 import os
-from urllib.request import urlopen
+import time
+from contextlib import closing
 
 from django.conf import settings as django_settings
+from django.contrib.gis.geos import Point
+from django.db import connection, transaction
 from tqdm import tqdm
 
+from area.models import City
 from artist.models import Artist
+from common.diff import TableDiff
+from common.downloads import Downloader, Manifest
+from common.flush import flush_models
+from common.telemetry import Telemetry
 
 logger = logging.getLogger(__name__)
 
 
 class Artists(object):
-	def __init__(self, quiet=False, force=False):
+	def __init__(self, quiet=False, force=False, offline=False, dry_run=False, data_dir=None, trace_memory=False,
+	             batch_size=1000):
 		self.export_url = {
 				'additional': 'http://millionsongdataset.com/sites/default/files/AdditionalFiles/'
 		}
@@ -43,9 +52,17 @@ class Artists(object):
 				}
 		}
 
-		self.data_dir = os.path.join(django_settings.MEDIA_ROOT, 'msd')
+		self.data_dir = data_dir or os.path.join(django_settings.MEDIA_ROOT, 'msd')
 		self.quiet = quiet
 		self.force = force
+		self.offline = offline
+		self.dry_run = dry_run
+		self.batch_size = batch_size
+		self.artist_fields = ['name', 'artist_mbid', 'track_id']
+		self.diffs = {}
+		self.telemetry = Telemetry(trace_memory=trace_memory)
+		self.manifest = Manifest(self.data_dir)
+		self.downloader = Downloader(manifest=self.manifest, offline=offline, content_types=['text/plain'])
 
 	def __download_file__(self, file_key):
 		if 'file_name' in self.files[file_key]:
@@ -55,67 +72,225 @@ class Artists(object):
 
 		for file_name in file_names:
 			urls = [e.format(file_name=file_name) for e in self.files[file_key]['urls']]
-			content = None
-			url = None
+			with self.telemetry.stage('download'):
+				self.downloader.download(file_name=file_name, urls=urls)
 
-			for url in urls:
-				try:
-					content = urlopen(url=url)
-					if content.headers['Content-Type'] not in ['text/plain']:
-						raise Exception("content type of downloaded file was %s", content.headers['Content-Type'])
-					logger.debug("Downloaded: %s", url)
-				except Exception as e:
-					logger.warning(e)
-					content = None
-					continue
-
-			if content is not None:
-				logger.debug("Saving: %s/%s", self.data_dir, file_name)
-				if not os.path.exists(self.data_dir):
-					os.makedirs(self.data_dir)
-
-				with open(os.path.join(self.data_dir, file_name), 'wb') as file:
-					file.write(content.read())
-			if not os.path.exists(os.path.join(self.data_dir, file_name)):
-				raise Exception("File not found and download failed: %s [%s]", file_name, url)
-
-	def __get_data__(self, file_key):
+	def __get_data__(self, file_key, desc=None):
 		if 'file_name' in self.files[file_key]:
 			file_names = [self.files[file_key]['file_name']]
 		else:
 			raise Exception("'file_name' key is missing from %s", self.files[file_key])
 
+		fields = self.files[file_key]['fields']
 		for file_name in file_names:
-			logger.debug("Reading: %s/%s", self.data_dir, file_name)
+			file_path = os.path.join(self.data_dir, file_name)
+			logger.debug("Reading: %s", file_path)
 
-			file_obj = io.open(os.path.join(self.data_dir, file_name), 'r', encoding='utf-8')
+			parse_seconds = 0.0
+			rows = 0
+			with io.open(file_path, 'rb') as file_obj, \
+					tqdm(disable=self.quiet, total=os.path.getsize(file_path), desc=desc, unit='B',
+					     unit_scale=True) as progress:
+				try:
+					for row in file_obj:
+						start = time.perf_counter()
+						progress.update(len(row))
+						item = dict(zip(fields, row.decode('utf-8').rstrip('\n').split('<SEP>')))
+						parse_seconds += time.perf_counter() - start
+						rows += 1
+						yield item
+				finally:
+					self.telemetry.add('parse', parse_seconds, rows=rows)
 
-			for row in file_obj:
-				yield dict(list(zip(self.files[file_key]['fields'], row.strip('\n').split('<SEP>'))))
+	def __bulk_save__(self, artists, existing_ids):
+		create = [artist for artist in artists if artist.pk not in existing_ids]
+		update = [artist for artist in artists if artist.pk in existing_ids]
+
+		with self.telemetry.stage('write', rows=len(artists)):
+			if create:
+				Artist.objects.bulk_create(create, batch_size=self.batch_size)
+			if update:
+				Artist.objects.bulk_update(update, fields=self.artist_fields, batch_size=self.batch_size)
+
+		existing_ids.update(artist.pk for artist in create)
+		logger.debug("Added %d, updated %d artists", len(create), len(update))
 
 	def import_options(self):
-		return ['artist']
+		return ['artist', 'artist_location']
 
 	def import_artist(self):
-		self.__download_file__(file_key='artist')
-		data = self.__get_data__(file_key='artist')
-		total_count = sum(1 for _ in data)
-		data = self.__get_data__(file_key='artist')
-
-		if Artist.objects.count() != total_count or self.force:
-			for item in tqdm(data, disable=self.quiet, total=total_count, desc="Importing artists"):
-				artist_id = item['artist_id']
-
-				if item['artist_name'] is not None:
-					defaults = {
-							'name': item['artist_name']
-					}
-
-					artist, created = Artist.objects.update_or_create(id=artist_id, defaults=defaults)
-					logger.debug("%s artist '%s'", "Added" if created else "Updated", defaults['name'])
-		else:
+		"""
+		Stream ``unique_artists.txt`` once and write the new and changed artists in batches.
+
+		An artist id listed again further down the file is skipped, the first row wins. The file is up-to-date when
+		it was imported before and the table still holds as many artists as that import did.
+		"""
+		file_key = 'artist'
+		file_name = self.files[file_key]['file_name']
+		self.__download_file__(file_key=file_key)
+
+		if not self.dry_run and not self.force and self.manifest.is_imported(file_name, rows=Artist.objects.count()):
 			logger.info("Database is already up-to-date")
+			return
+
+		with self.telemetry.stage('diff'):
+			diff = TableDiff(Artist, self.artist_fields)
+		existing_ids = set(diff.hashes)
+		batch = []
+
+		with closing(self.__get_data__(file_key=file_key, desc="Importing artists")) as data, transaction.atomic():
+			for item in data:
+				if not item.get('artist_id') or not item.get('artist_name'):
+					diff.skip()
+					self.telemetry.skip("artist: missing name")
+					continue
+				if item['artist_id'] in diff.seen:
+					diff.skip()
+					self.telemetry.skip("artist: duplicate id")
+					continue
+
+				artist = Artist(id=item['artist_id'], name=item['artist_name'],
+				                artist_mbid=item.get('artist_mbid', ''), track_id=item.get('track_id', ''))
+				if diff.classify(artist) == 'unchanged' or self.dry_run:
+					continue
+
+				batch.append(artist)
+				if len(batch) >= self.batch_size:
+					self.__bulk_save__(batch, existing_ids)
+					batch = []
+
+			if batch:
+				self.__bulk_save__(batch, existing_ids)
+
+		self.diffs[file_key] = diff.report()
+		if not self.dry_run:
+			self.manifest.mark_imported(file_name, rows=len(diff.seen))
+			self.telemetry.write(os.path.join(self.data_dir, "import_report.json"))
+
+	def import_artist_location(self):
+		"""
+		Store the coordinates of ``artist_location.txt`` on the artists and link them to their nearest city.
+
+		Rows of artists missing from the artist table are skipped. Artists whose coordinates changed are updated in
+		batches, then every located artist is linked in a single spatial join.
+		"""
+		file_key = 'artist_location'
+		file_name = self.files[file_key]['file_name']
+		self.__download_file__(file_key=file_key)
+
+		if not self.dry_run and not self.force and \
+				self.manifest.is_imported(file_name, rows=Artist.objects.filter(location__isnull=False).count()):
+			logger.info("Database is already up-to-date")
+			return
+
+		with self.telemetry.stage('diff'):
+			diff = TableDiff(Artist, ['location'])
+		batch = []
+
+		with closing(self.__get_data__(file_key=file_key, desc="Importing artist locations")) as data, \
+				transaction.atomic():
+			for item in data:
+				artist_id = item.get('artist_id')
+				if artist_id not in diff:
+					diff.skip()
+					self.telemetry.skip("artist_location: unknown artist")
+					continue
+				if artist_id in diff.seen:
+					diff.skip()
+					self.telemetry.skip("artist_location: duplicate id")
+					continue
+
+				try:
+					location = Point(float(item['longitude']), float(item['latitude']), srid=4326)
+				except (KeyError, ValueError):
+					diff.skip()
+					self.telemetry.skip("artist_location: invalid coordinates")
+					continue
+
+				artist = Artist(id=artist_id, location=location)
+				if diff.classify(artist) == 'unchanged' or self.dry_run:
+					continue
+
+				batch.append(artist)
+				if len(batch) >= self.batch_size:
+					with self.telemetry.stage('write', rows=len(batch)):
+						Artist.objects.bulk_update(batch, fields=['location'], batch_size=self.batch_size)
+					batch = []
+
+			if batch:
+				with self.telemetry.stage('write', rows=len(batch)):
+					Artist.objects.bulk_update(batch, fields=['location'], batch_size=self.batch_size)
+
+			if not self.dry_run:
+				self.link_artist_location()
+
+		self.diffs[file_key] = diff.report()
+		if not self.dry_run:
+			self.manifest.mark_imported(file_name, rows=len(diff.seen))
+			self.telemetry.write(os.path.join(self.data_dir, "import_report.json"))
+
+	def link_artist_location(self, max_distance=50):
+		"""
+		Link every located artist to the nearest city within ``max_distance`` km and its region and country, and
+		unlink the others.
+
+		The nearest city is found by a lateral join ordered by the ``<->`` distance between geographies, so it is
+		measured on the sphere and stays right near the poles and across the antimeridian. The geography index on
+		the city locations serves it, so the whole table is linked by one statement. Only rows whose links change
+		are written. Returns the number of artists whose links changed.
+		"""
+		quote = connection.ops.quote_name
+		tables = {'artist': quote(Artist._meta.db_table), 'city': quote(City._meta.db_table)}
+
+		with self.telemetry.stage('link'), connection.cursor() as cursor:
+			cursor.execute(
+					"""
+					UPDATE {artist} AS artist
+					SET city_id = nearest.id, region_id = nearest.region_id, country_id = nearest.country_id
+					FROM {artist} AS located
+					LEFT JOIN LATERAL (
+						SELECT city.id, city.region_id, city.country_id
+						FROM {city} AS city
+						WHERE ST_DWithin(city.location::geography, located.location::geography, %s)
+						ORDER BY city.location::geography <-> located.location::geography
+						LIMIT 1
+					) AS nearest ON true
+					WHERE artist.id = located.id AND located.location IS NOT NULL
+					  AND (artist.city_id IS DISTINCT FROM nearest.id
+					       OR artist.region_id IS DISTINCT FROM nearest.region_id
+					       OR artist.country_id IS DISTINCT FROM nearest.country_id)
+					""".format(**tables),
+					[max_distance * 1000]
+			)
+			linked = cursor.rowcount
+
+			cursor.execute(
+					"""
+					UPDATE {artist}
+					SET city_id = NULL, region_id = NULL, country_id = NULL
+					WHERE location IS NULL
+					  AND (city_id IS NOT NULL OR region_id IS NOT NULL OR country_id IS NOT NULL)
+					""".format(**tables)
+			)
+			linked += cursor.rowcount
+
+		logger.info("Linked %d artists to their nearest city", linked)
+		return linked
 
 	def flush_artist(self):
 		logger.info("Flushing artist data")
-		Artist.objects.all().delete()
+		counts = flush_models(Artist, dry_run=self.dry_run)
+		if not self.dry_run:
+			self.manifest.clear_imported(self.files['artist']['file_name'])
+			self.manifest.clear_imported(self.files['artist_location']['file_name'])
+		return counts
+
+	def flush_artist_location(self):
+		logger.info("Flushing artist locations")
+		located = Artist.objects.filter(location__isnull=False)
+		counts = {Artist._meta.label + '.location': located.count()}
+		if not self.dry_run:
+			located.update(location=None)
+			self.link_artist_location()
+			self.manifest.clear_imported(self.files['artist_location']['file_name'])
+		return counts
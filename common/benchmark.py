@@ -0,0 +1,127 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import logging
+import os
+import random
+import string
+import time
+import tracemalloc
+import zipfile
+from contextlib import contextmanager
+from itertools import product
+
+from django.db import connection
+
+from area.enums import ContinentEnum
+
+logger = logging.getLogger(__name__)
+
+SYLLABLES = ['ba', 'ca', 'da', 'el', 'fo', 'ga', 'hu', 'in', 'ja', 'ko', 'la', 'mo', 'na', 'or', 'pa', 'qu', 'ri',
+             'sa', 'to', 'ur', 'va', 'wi', 'xe', 'yo', 'za', 'ñu', 'ré', 'öl', 'ås']
+
+
+class SyntheticData(object):
+	"""
+	Writes synthetic geonames and Million Song Dataset files shaped like the real dumps.
+
+	Rows use the same columns, separators and value formats as ``countryInfo.txt``, ``admin1CodesASCII.txt``,
+	``cities<population>.zip`` and ``unique_artists.txt``, with accented names, comma separated alternate names and
+	a share of rows the importers have to skip, so the importers can be measured offline at any size.
+	"""
+
+	def __init__(self, seed=0):
+		self.random = random.Random(seed)
+
+	def name(self, syllables=3):
+		return ''.join(self.random.choice(SYLLABLES) for _ in range(self.random.randint(2, syllables))).title()
+
+	def write_geonames(self, data_dir, countries=50, regions=20, cities=10000, population=500):
+		"""Write the country, region and city files into ``data_dir``, returning the number of rows of each"""
+		if not os.path.exists(data_dir):
+			os.makedirs(data_dir)
+
+		codes = [''.join(pair) for pair in product(string.ascii_uppercase, repeat=2)][:countries]
+		continents = [continent.name for continent in ContinentEnum]
+
+		with open(os.path.join(data_dir, 'countryInfo.txt'), 'w', encoding='utf-8') as file_obj:
+			file_obj.write("#ISO\tISO3\tISO-Numeric\tfips\tCountry\tCapital\tArea(in sq km)\tPopulation\tContinent\n")
+			for index, code in enumerate(codes):
+				file_obj.write('\t'.join([
+						code, code + 'X', str(index), code, self.name(4), self.name(), str(self.random.randint(1, 10 ** 6)),
+						str(self.random.randint(1, 10 ** 8)), self.random.choice(continents), '.' + code.lower(), 'XXX',
+						'Currency', str(index), '', '', 'en', str(1000000 + index), '', ''
+				]) + '\n')
+
+		region_codes = []
+		with open(os.path.join(data_dir, 'admin1CodesASCII.txt'), 'w', encoding='utf-8') as file_obj:
+			for country_index, code in enumerate(codes):
+				for region_index in range(1, regions + 1):
+					name = self.name()
+					region_codes.append((code, '%02d' % region_index))
+					file_obj.write('\t'.join(['%s.%02d' % (code, region_index), name, name,
+					                          str(2000000 + country_index * regions + region_index)]) + '\n')
+
+		file_name = 'cities{}'.format(population)
+		with zipfile.ZipFile(os.path.join(data_dir, file_name + '.zip'), 'w', zipfile.ZIP_DEFLATED) as archive, \
+				archive.open(file_name + '.txt', 'w') as file_obj:
+			for index in range(cities):
+				country_code, region_code = self.random.choice(region_codes)
+				if self.random.random() < 0.01:
+					region_code = '99'
+				name = self.name()
+				alternate_names = ','.join(self.name() for _ in range(self.random.randint(0, 8)))
+				file_obj.write(('\t'.join([
+						str(3000000 + index), name, name, alternate_names,
+						'%.5f' % self.random.uniform(-90, 90), '%.5f' % self.random.uniform(-180, 180), 'P',
+						self.random.choice(['PPL', 'PPLA', 'PPLC']), country_code, '', region_code, '', '', '',
+						str(self.random.randint(population, 10 ** 7)), str(self.random.randint(0, 3000)), '0',
+						'Etc/UTC', '2020-01-01'
+				]) + '\n').encode('utf-8'))
+
+		return {'country': len(codes), 'region': len(region_codes), file_name: cities}
+
+	def write_msd(self, data_dir, artists=10000):
+		"""Write ``unique_artists.txt`` into ``data_dir``, returning the number of rows"""
+		if not os.path.exists(data_dir):
+			os.makedirs(data_dir)
+
+		with open(os.path.join(data_dir, 'unique_artists.txt'), 'w', encoding='utf-8') as file_obj:
+			for index in range(artists):
+				file_obj.write('<SEP>'.join([
+						'AR%016X' % index, '%08x-0000-0000-0000-%012x' % (index, index), 'TR%016X' % index,
+						' '.join([self.name(), self.name()])
+				]) + '\n')
+
+		return {'artist': artists}
+
+
+@contextmanager
+def measure(stage, rows, trace_memory=True):
+	"""
+	Measure the wall time, queries and peak Python memory of a block.
+
+	``rows`` is a callable returning the number of rows processed once the block is done. The measurements are stored
+	in the yielded dict.
+	"""
+	result = {'stage': stage}
+	queries = [0]
+
+	def count(execute, sql, params, many, context):
+		queries[0] += 1
+		return execute(sql, params, many, context)
+
+	if trace_memory:
+		tracemalloc.start()
+	start = time.perf_counter()
+
+	try:
+		with connection.execute_wrapper(count):
+			yield result
+	finally:
+		result['seconds'] = time.perf_counter() - start
+		if trace_memory:
+			result['peak_memory'] = tracemalloc.get_traced_memory()[1]
+			tracemalloc.stop()
+
+	result['queries'] = queries[0]
+	result['rows'] = rows()
+	result['rows_per_second'] = result['rows'] / result['seconds'] if result['seconds'] else 0
@@ -0,0 +1,103 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import hashlib
+import logging
+
+from django.contrib.gis.geos import GEOSGeometry
+
+logger = logging.getLogger(__name__)
+
+
+def _number(value):
+	if isinstance(value, tuple):
+		return tuple(_number(item) for item in value)
+	if isinstance(value, float) and value.is_integer():
+		# Compare like the numbers they are, whichever of both types the database and the dump use
+		return int(value)
+	return value
+
+
+def _comparable(value):
+	if isinstance(value, GEOSGeometry):
+		return _number(value.coords)
+	if isinstance(value, (list, tuple, set)):
+		return tuple(sorted(_comparable(item) for item in value))
+	return _number(value)
+
+
+def row_hash(values):
+	"""
+	Digest of a row, the same in every process.
+
+	The builtin ``hash`` of strings changes with every interpreter, so rows hashed in import workers or stored by
+	another run would not compare. The values are digested through their ``repr`` instead, which is canonical for
+	the strings, numbers and tuples left by ``_comparable``.
+	"""
+	return hashlib.blake2b(repr(tuple(_comparable(value) for value in values)).encode('utf-8'),
+	                       digest_size=16).digest()
+
+
+class TableDiff(object):
+	"""
+	Compares the rows of a dump with the current content of a table.
+
+	One ``values_list`` pass over the table keeps a hash of the compared fields for every primary key. Objects built
+	from the dump are then classified as inserted, updated or unchanged as they stream by, and the keys that never
+	showed up are reported as missing from the dump. ``annotations`` adds computed values, e.g. aggregated related
+	rows, that are read from the attribute of the same name on the built objects.
+	"""
+
+	def __init__(self, model, fields, annotations=None):
+		self.model = model
+		self.annotations = annotations or {}
+		self.attnames = [model._meta.get_field(field).attname for field in fields] + list(self.annotations)
+
+		queryset = model._base_manager.order_by()
+		if self.annotations:
+			queryset = queryset.annotate(**self.annotations)
+
+		self.hashes = {row[0]: row_hash(row[1:]) for row in
+		               queryset.values_list('pk', *fields, *self.annotations).iterator()}
+		self.seen = set()
+		self.counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+
+	def __contains__(self, pk):
+		return pk in self.hashes
+
+	def classify(self, obj):
+		"""Count ``obj`` and return whether it is ``inserted``, ``updated`` or ``unchanged``"""
+		pk = obj.pk
+		self.seen.add(pk)
+
+		current = self.hashes.get(pk)
+		if current is None:
+			status = 'inserted'
+		elif current == row_hash(getattr(obj, attname) for attname in self.attnames):
+			status = 'unchanged'
+		else:
+			status = 'updated'
+
+		self.counts[status] += 1
+		return status
+
+	def changed(self, objs):
+		"""The objects that differ from the table, which are the only ones an import has to write"""
+		return [obj for obj in objs if self.classify(obj) != 'unchanged']
+
+	def skip(self, count=1):
+		self.counts['skipped'] += count
+
+	def reset(self):
+		"""Forget what was classified so far, e.g. in a worker that reports every batch separately"""
+		self.seen = set()
+		self.counts = dict.fromkeys(self.counts, 0)
+
+	def merge(self, counts, seen):
+		"""Add the ``counts`` and ``seen`` keys another copy of this diff classified, e.g. in a worker process"""
+		for status, count in counts.items():
+			self.counts[status] += count
+		self.seen.update(seen)
+
+	def report(self):
+		report = dict(self.counts)
+		report['missing'] = len(self.hashes.keys() - self.seen)
+		return report
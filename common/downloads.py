@@ -0,0 +1,233 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import hashlib
+import http.client
+import json
+import logging
+import os
+import threading
+from contextlib import closing
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+	sha256 = hashlib.sha256()
+
+	with open(file_path, 'rb') as file_obj:
+		for chunk in iter(lambda: file_obj.read(chunk_size), b''):
+			sha256.update(chunk)
+
+	return sha256.hexdigest()
+
+
+class Manifest(object):
+	"""
+	Keeps track of the files downloaded into a data directory.
+
+	Every entry stores the size, modification time, SHA-256, ``ETag`` and ``Last-Modified`` header of a file and the
+	SHA-256 of the content that was last imported successfully, so importers can tell when a dump has not changed.
+	Updates are serialized, so files can be downloaded in a background thread while others are imported.
+	"""
+
+	def __init__(self, data_dir, file_name='manifest.json'):
+		self.data_dir = data_dir
+		self.manifest_file = os.path.join(data_dir, file_name)
+		self.lock = threading.RLock()
+
+		try:
+			with open(self.manifest_file, 'r') as fp:
+				self.entries = json.load(fp)
+		except FileNotFoundError:
+			self.entries = {}
+		except ValueError:
+			logger.warning("Ignoring corrupt manifest '%s'", self.manifest_file)
+			self.entries = {}
+
+	def get(self, file_name):
+		return self.entries.get(file_name, {})
+
+	def save(self):
+		with self.lock:
+			if not os.path.exists(self.data_dir):
+				os.makedirs(self.data_dir)
+
+			with open(self.manifest_file, 'w+') as fp:
+				json.dump(self.entries, fp, sort_keys=True, indent=4)
+
+	def update(self, file_name, **kwargs):
+		with self.lock:
+			self.entries.setdefault(file_name, {}).update(kwargs)
+			self.save()
+
+	def record(self, file_name, headers=None, url=None):
+		"""Store size and hash of a file on disk along with the caching headers it was served with"""
+		file_path = os.path.join(self.data_dir, file_name)
+		entry = {
+				'size':   os.path.getsize(file_path),
+				'mtime':  os.stat(file_path).st_mtime_ns,
+				'sha256': file_sha256(file_path)
+		}
+
+		if headers is not None:
+			entry['etag'] = headers.get('ETag')
+			entry['last_modified'] = headers.get('Last-Modified')
+		if url is not None:
+			entry['url'] = url
+
+		self.update(file_name, **entry)
+
+	def is_current(self, file_name):
+		"""Whether the file on disk still has the size and modification time recorded in the manifest"""
+		file_path = os.path.join(self.data_dir, file_name)
+		entry = self.get(file_name)
+
+		if not os.path.exists(file_path):
+			return False
+		stat = os.stat(file_path)
+		return entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime_ns
+
+	def conditional_headers(self, file_name):
+		"""Request headers asking the server to answer ``304 Not Modified`` when our copy is current"""
+		entry = self.get(file_name)
+		headers = {}
+
+		if self.is_current(file_name):
+			if entry.get('etag'):
+				headers['If-None-Match'] = entry['etag']
+			if entry.get('last_modified'):
+				headers['If-Modified-Since'] = entry['last_modified']
+
+		return headers
+
+	def is_imported(self, file_name, rows=None):
+		"""
+		Whether the file on disk is byte-identical to the one last imported, going by its SHA-256.
+
+		Importers pass the ``rows`` their table accounts for, which must still match the rows recorded by
+		``mark_imported``, so a table emptied or restored behind the importer's back is imported again.
+		"""
+		entry = self.get(file_name)
+
+		if rows is not None and rows != entry.get('rows'):
+			return False
+		return self.is_current(file_name) and entry.get('imported_sha256') is not None and \
+		       entry.get('sha256') == entry.get('imported_sha256') and \
+		       file_sha256(os.path.join(self.data_dir, file_name)) == entry['imported_sha256']
+
+	def mark_imported(self, file_name, rows=None):
+		"""Record the SHA-256 of the file on disk as imported, even when it changed without the manifest noticing"""
+		sha256 = file_sha256(os.path.join(self.data_dir, file_name))
+		self.update(file_name, sha256=sha256, imported_sha256=sha256, rows=rows)
+
+	def clear_imported(self, file_name):
+		if file_name in self.entries:
+			self.update(file_name, imported_sha256=None, rows=None)
+
+
+class Downloader(object):
+	"""
+	Streams files into a data directory.
+
+	The response is written in ``chunk_size`` pieces to a ``.part`` file next to the target which is renamed over
+	the target once complete, so readers never see a half written file. An interrupted transfer is resumed with an
+	HTTP ``Range`` request, guarded by ``If-Range`` so a file that changed on the server is downloaded from scratch.
+	Mirrors are tried in order until one succeeds.
+	"""
+	chunk_size = 1024 * 1024
+	retries = 3
+	timeout = 60
+
+	def __init__(self, manifest, content_types, offline=False, chunk_size=None, retries=None):
+		self.manifest = manifest
+		self.content_types = content_types
+		self.offline = offline
+		self.chunk_size = chunk_size or self.chunk_size
+		self.retries = retries or self.retries
+
+	def download(self, file_name, urls):
+		"""Bring ``file_name`` up to date from the first working url and return the path of the local copy"""
+		file_path = os.path.join(self.manifest.data_dir, file_name)
+
+		if self.offline:
+			if not os.path.exists(file_path):
+				raise Exception("File not found and offline mode is enabled: %s" % file_path)
+			if not self.manifest.is_current(file_name):
+				self.manifest.record(file_name)
+			logger.debug("Using local copy: %s", file_path)
+			return file_path
+
+		if not os.path.exists(self.manifest.data_dir):
+			os.makedirs(self.manifest.data_dir)
+
+		for url in urls:
+			try:
+				self.__fetch__(file_name=file_name, url=url)
+				return file_path
+			except Exception as e:
+				logger.warning("Download failed: %s: %s", url, e)
+
+		if not os.path.exists(file_path):
+			raise Exception("File not found and download failed: %s %s" % (file_name, urls))
+
+		logger.warning("Using stale local copy: %s", file_path)
+		return file_path
+
+	def __fetch__(self, file_name, url):
+		file_path = os.path.join(self.manifest.data_dir, file_name)
+		part_path = file_path + '.part'
+		validator = self.manifest.get(file_name).get('partial_validator')
+
+		for attempt in range(1, self.retries + 1):
+			offset = os.path.getsize(part_path) if os.path.exists(part_path) and validator else 0
+			if offset:
+				headers = {'Range': 'bytes=%d-' % offset, 'If-Range': validator}
+			else:
+				headers = self.manifest.conditional_headers(file_name)
+
+			try:
+				response = urlopen(Request(url=url, headers=headers), timeout=self.timeout)
+			except HTTPError as e:
+				if e.code == 304:
+					logger.debug("Not modified: %s", url)
+					return
+				if e.code == 416:
+					logger.debug("Discarding unusable partial download: %s", part_path)
+					os.remove(part_path)
+					validator = None
+					continue
+				raise
+
+			with closing(response):
+				content_type = response.headers['Content-Type']
+				if content_type not in self.content_types:
+					raise Exception("content type of downloaded file was %s" % content_type)
+
+				if response.status != 206:
+					offset = 0
+				validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+				self.manifest.update(file_name, partial_validator=validator)
+
+				content_length = response.headers.get('Content-Length')
+				expected_size = offset + int(content_length) if content_length else None
+
+				try:
+					with open(part_path, 'ab' if offset else 'wb') as file_obj:
+						for chunk in iter(lambda: response.read(self.chunk_size), b''):
+							file_obj.write(chunk)
+				except (OSError, http.client.HTTPException) as e:
+					logger.warning("Download of %s interrupted (attempt %d/%d): %s", url, attempt, self.retries, e)
+					continue
+
+			if expected_size is not None and os.path.getsize(part_path) != expected_size:
+				logger.warning("Download of %s incomplete (attempt %d/%d)", url, attempt, self.retries)
+				continue
+
+			os.replace(part_path, file_path)
+			logger.debug("Downloaded: %s", url)
+			self.manifest.record(file_name, headers=response.headers, url=url)
+			self.manifest.update(file_name, partial_validator=None)
+			return
+
+		raise Exception("giving up after %d attempts" % self.retries)
@@ -0,0 +1,92 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import logging
+from contextlib import contextmanager
+
+from django.db import connection
+
+from common.models import DeferredIndex
+
+logger = logging.getLogger(__name__)
+
+
+def restore_deferred_indexes(*models):
+	"""
+	Rebuild the indexes a killed or failed bulk load dropped and never rebuilt, for ``models`` or all tables.
+
+	Returns the number of indexes rebuilt.
+	"""
+	if connection.vendor != 'postgresql':
+		return 0
+
+	deferred = DeferredIndex.objects.all()
+	if models:
+		deferred = deferred.filter(table__in=[model._meta.db_table for model in models])
+
+	rebuilt = 0
+	with connection.cursor() as cursor:
+		for index in list(deferred):
+			cursor.execute('SELECT to_regclass(%s)', [index.name])
+			if cursor.fetchone()[0] is None:
+				cursor.execute(index.definition)
+				rebuilt += 1
+			index.delete()
+
+	if rebuilt:
+		logger.warning("Rebuilt %d indexes left dropped by an interrupted bulk load", rebuilt)
+	return rebuilt
+
+
+@contextmanager
+def deferred_indexes(*models, keep=()):
+	"""
+	Drop the secondary indexes of the models' tables for the duration of a bulk load and rebuild them afterwards.
+
+	Building an index once over a loaded table is much cheaper than maintaining it row by row. Primary keys, unique
+	indexes and indexes backing a constraint are kept, so the load still sees duplicates and conflicts. Queries
+	running meanwhile lose the dropped indexes too, so this is meant for initial loads and full refreshes. Only
+	PostgreSQL is supported; on other databases the indexes are left alone. The single column indexes of the ``keep``
+	fields are kept as well, for lookups the load itself makes.
+
+	The definitions of the dropped indexes are stored in ``DeferredIndex`` until they are rebuilt, so indexes left
+	dropped by a killed load are rebuilt by ``restore_deferred_indexes`` when the next one starts.
+	"""
+	if connection.vendor != 'postgresql':
+		yield
+		return
+
+	restore_deferred_indexes(*models)
+
+	with connection.cursor() as cursor:
+		cursor.execute(
+				"""
+				SELECT i.indexrelid::regclass::text, i.indrelid::regclass::text, pg_get_indexdef(i.indexrelid),
+				       CASE WHEN i.indnatts = 1 THEN (SELECT a.attname FROM pg_attribute a
+				                                      WHERE a.attrelid = i.indrelid AND a.attnum = i.indkey[0]) END
+				FROM pg_index i
+				WHERE i.indrelid = ANY(%s::regclass[]) AND NOT i.indisprimary AND NOT i.indisunique
+				  AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+				""",
+				[[connection.ops.quote_name(model._meta.db_table) for model in models]]
+		)
+		kept = {(field.model._meta.db_table, field.column) for field in keep}
+		definitions = [(name, table.strip('"'), definition) for name, table, definition, column in cursor.fetchall()
+		               if (table.strip('"'), column) not in kept]
+
+		DeferredIndex.objects.bulk_create([DeferredIndex(name=name, table=table, definition=definition)
+		                                   for name, table, definition in definitions])
+		for name, _, _ in definitions:
+			cursor.execute('DROP INDEX %s' % name)
+	logger.info("Dropped %d indexes until the bulk load is done", len(definitions))
+
+	succeeded = False
+	try:
+		yield
+		succeeded = True
+	finally:
+		# A failed load inside a transaction is rolled back along with the drops and their records
+		if succeeded or not connection.in_atomic_block:
+			with connection.cursor() as cursor:
+				for _, _, definition in definitions:
+					cursor.execute(definition)
+			DeferredIndex.objects.filter(name__in=[name for name, _, _ in definitions]).delete()
+			logger.info("Rebuilt %d indexes", len(definitions))
@@ -0,0 +1,142 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from area.enums import ContinentEnum
+from area.utils import Geoname
+from artist.utils import Artists
+from common.benchmark import measure, SyntheticData
+
+logger = logging.getLogger(__name__)
+
+
+class Rollback(Exception):
+	pass
+
+
+class Command(BaseCommand):
+	help = 'Measure the geonames and MSD importers against generated files, rolling back everything they write'
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+				'--countries',
+				default=50,
+				type=int,
+				dest='countries',
+				help='Number of generated countries, at most 676'
+		)
+
+		parser.add_argument(
+				'--regions',
+				default=20,
+				type=int,
+				dest='regions',
+				help='Number of generated regions per country'
+		)
+
+		parser.add_argument(
+				'--cities',
+				default=10000,
+				type=int,
+				dest='cities',
+				help='Number of generated cities'
+		)
+
+		parser.add_argument(
+				'--artists',
+				default=10000,
+				type=int,
+				dest='artists',
+				help='Number of generated artists'
+		)
+
+		parser.add_argument(
+				'--batch-size',
+				default=1000,
+				type=int,
+				dest='batch_size',
+				help='Number of rows written to the database per query'
+		)
+
+		parser.add_argument(
+				'--seed',
+				default=0,
+				type=int,
+				dest='seed',
+				help='Seed of the generated data'
+		)
+
+		parser.add_argument(
+				'--data-dir',
+				default='',
+				dest='data_dir',
+				help='Directory to keep the generated files in instead of a temporary one'
+		)
+
+		parser.add_argument(
+				'--json',
+				default='',
+				dest='json',
+				help='File to write the results to'
+		)
+
+		parser.add_argument(
+				'--no-memory',
+				action='store_false',
+				default=True,
+				dest='trace_memory',
+				help='Do not trace memory, which slows the importers down'
+		)
+
+	def handle(self, *args, **options):
+		data_dir = options['data_dir'] or tempfile.mkdtemp(prefix='benchmark-')
+		geoname_dir = os.path.join(data_dir, 'geoname')
+		msd_dir = os.path.join(data_dir, 'msd')
+
+		try:
+			generator = SyntheticData(seed=options['seed'])
+			sizes = generator.write_geonames(geoname_dir, countries=options['countries'], regions=options['regions'],
+			                                 cities=options['cities'])
+			sizes.update(generator.write_msd(msd_dir, artists=options['artists']))
+
+			geoname = Geoname(quiet=True, force=True, batch_size=options['batch_size'], offline=True,
+			                  data_dir=geoname_dir)
+			artists = Artists(quiet=True, force=True, offline=True, data_dir=msd_dir, batch_size=options['batch_size'])
+
+			stages = [
+					('continent', geoname.import_continent, lambda: len(ContinentEnum)),
+					('country', geoname.import_country, lambda: geoname.row_count.get('country', 0)),
+					('region', geoname.import_region, lambda: geoname.row_count.get('region', 0)),
+					('city', lambda: geoname.import_city(population=500), lambda: geoname.row_count.get('city500', 0)),
+					('artist', artists.import_artist, lambda: sizes['artist'])
+			]
+
+			results = []
+			try:
+				with transaction.atomic():
+					for stage, func, rows in stages:
+						with measure(stage, rows, trace_memory=options['trace_memory']) as result:
+							func()
+						results.append(result)
+					raise Rollback()
+			except Rollback:
+				pass
+		finally:
+			if not options['data_dir']:
+				shutil.rmtree(data_dir, ignore_errors=True)
+
+		for result in results:
+			self.stdout.write("%-10s %9d rows %9.2fs %11.1f rows/s %8d queries %10s" % (
+					result['stage'], result['rows'], result['seconds'], result['rows_per_second'], result['queries'],
+					'%.1f MiB' % (result['peak_memory'] / 2 ** 20) if 'peak_memory' in result else '-'))
+
+		if options['json']:
+			with open(options['json'], 'w+') as fp:
+				json.dump({'sizes': sizes, 'options': {key: options[key] for key in ['batch_size', 'seed']},
+				           'stages': results}, fp, indent=4)
@@ -0,0 +1,26 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeferredIndex',
+            fields=[
+                ('name', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('table', models.CharField(db_index=True, max_length=200)),
+                ('definition', models.TextField()),
+                ('dropped_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Deferred Index',
+                'verbose_name_plural': 'Deferred Indexes',
+            },
+        ),
+    ]
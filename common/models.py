@@ -1,3 +1,19 @@
 #  Copyright (c) 2019 - 2019. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
 
+from django.db import models
+
+
 # Create your models here.
+class DeferredIndex(models.Model):
+	"""An index dropped for a bulk load by ``deferred_indexes``, kept until it is rebuilt"""
+	name = models.CharField(max_length=200, primary_key=True)
+	table = models.CharField(max_length=200, db_index=True)
+	definition = models.TextField()
+	dropped_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		verbose_name = 'Deferred Index'
+		verbose_name_plural = 'Deferred Indexes'
+
+	def __str__(self):
+		return self.name
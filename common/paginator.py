@@ -0,0 +1,42 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import logging
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+
+class EstimatedCountPaginator(Paginator):
+	"""
+	Paginator that takes the row count of large unfiltered tables from the PostgreSQL planner statistics.
+
+	An exact ``COUNT(*)`` scans the whole table, which dominates the admin change list of tables with hundreds of
+	thousands of rows. ``pg_class.reltuples`` is kept up to date by ``ANALYZE`` and autovacuum and is close enough for
+	pagination. Filtered querysets and tables estimated below ``threshold`` rows are still counted exactly.
+	"""
+	threshold = 10000
+
+	@cached_property
+	def count(self):
+		estimate = self.estimated_count()
+		if estimate is not None and estimate >= self.threshold:
+			return estimate
+		return super().count
+
+	def estimated_count(self):
+		queryset = self.object_list
+		if not hasattr(queryset, 'query') or queryset.query.where or queryset.query.distinct:
+			return None
+
+		connection = connections[queryset.db]
+		if connection.vendor != 'postgresql':
+			return None
+
+		with connection.cursor() as cursor:
+			cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+			               [connection.ops.quote_name(queryset.model._meta.db_table)])
+			row = cursor.fetchone()
+
+		return row[0] if row and row[0] > 0 else None
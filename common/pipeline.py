@@ -0,0 +1,101 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class BoundedStage(object):
+	"""
+	Runs a generator in a background thread and hands its items to the consumer through a bounded queue.
+
+	The producer, e.g. decompressing and parsing a dump, then overlaps with whatever the consumer does with the
+	items, e.g. writing them to the database, and is blocked once ``maxsize`` items are waiting so memory stays
+	bounded. Exceptions raised by the producer are re-raised in the consumer. The generator is closed in the
+	producer thread, also when the consumer stops early.
+
+	``report`` returns the throughput of the producer and the depth of the queue seen by the consumer: a queue that
+	is usually full means the consumer is the slowest stage, an empty one that the producer is.
+	"""
+
+	def __init__(self, name, iterable, maxsize=4):
+		self.name = name
+		self.iterable = iterable
+		self.queue = queue.Queue(maxsize=maxsize)
+		self.stopped = threading.Event()
+		self.thread = threading.Thread(target=self.__produce__, name=name, daemon=True)
+		self.error = None
+		self.items = 0
+		self.busy = 0.0
+		self.waited = 0.0
+		self.depth_total = 0
+		self.depth_max = 0
+
+	def __put__(self, item):
+		while not self.stopped.is_set():
+			try:
+				self.queue.put(item, timeout=0.1)
+				return True
+			except queue.Full:
+				continue
+		return False
+
+	def __produce__(self):
+		iterator = iter(self.iterable)
+		try:
+			while not self.stopped.is_set():
+				start = time.perf_counter()
+				try:
+					item = next(iterator)
+				except StopIteration:
+					break
+				finally:
+					self.busy += time.perf_counter() - start
+
+				self.items += 1
+				if not self.__put__(item):
+					break
+		except Exception as e:
+			self.error = e
+		finally:
+			close = getattr(iterator, 'close', None)
+			if close is not None:
+				close()
+			self.__put__(_DONE)
+
+	def __iter__(self):
+		self.thread.start()
+		try:
+			while True:
+				depth = self.queue.qsize()
+				self.depth_total += depth
+				self.depth_max = max(self.depth_max, depth)
+
+				start = time.perf_counter()
+				item = self.queue.get()
+				self.waited += time.perf_counter() - start
+
+				if item is _DONE:
+					break
+				yield item
+
+			if self.error is not None:
+				raise self.error
+		finally:
+			self.stopped.set()
+			self.thread.join()
+
+	def report(self):
+		return {
+				'stage':            self.name,
+				'items':            self.items,
+				'busy_seconds':     round(self.busy, 3),
+				'items_per_second': round(self.items / self.busy, 1) if self.busy else 0,
+				'consumer_waited':  round(self.waited, 3),
+				'max_queue_depth':  self.depth_max,
+				'mean_queue_depth': round(self.depth_total / (self.items + 1), 2)
+		}
@@ -0,0 +1,104 @@
+#  Copyright (c) 2019 - 2020. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import json
+import logging
+import resource
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+metrics_logger = logging.getLogger('metrics')
+
+
+class Telemetry(object):
+	"""
+	Collects per-stage timings, query counts, row counts and skip reasons of an import run.
+
+	Stages accumulate over calls, so a stage measured once per batch or row ends up with its total. Queries are
+	counted on the database connection of the thread running the stage. ``report`` adds rows/s per stage and the
+	peak memory of the process: the maximum resident set size always, and the ``tracemalloc`` peak of Python
+	allocations when ``trace_memory`` is set, which slows the import down noticeably.
+	"""
+
+	def __init__(self, trace_memory=False):
+		self.started = time.time()
+		self.stages = {}
+		self.skipped = Counter()
+		self.lock = threading.Lock()
+		self.trace_memory = trace_memory and not tracemalloc.is_tracing()
+
+		if self.trace_memory:
+			tracemalloc.start()
+
+	def add(self, stage, seconds, rows=0, queries=0):
+		with self.lock:
+			entry = self.stages.setdefault(stage, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'queries': 0})
+			entry['calls'] += 1
+			entry['seconds'] += seconds
+			entry['rows'] += rows
+			entry['queries'] += queries
+
+	@contextmanager
+	def stage(self, stage, rows=0):
+		queries = [0]
+
+		def count(execute, sql, params, many, context):
+			queries[0] += 1
+			return execute(sql, params, many, context)
+
+		start = time.perf_counter()
+		try:
+			with connection.execute_wrapper(count):
+				yield
+		finally:
+			self.add(stage, time.perf_counter() - start, rows=rows, queries=queries[0])
+
+	def skip(self, reason, count=1):
+		with self.lock:
+			self.skipped[reason] += count
+
+	def merge(self, stages, skipped):
+		"""Add the ``stages`` and ``skipped`` reasons recorded by another instance, e.g. in a worker process"""
+		for stage, entry in stages.items():
+			self.add(stage, entry['seconds'], rows=entry['rows'], queries=entry['queries'])
+		with self.lock:
+			self.skipped.update(skipped)
+
+	def report(self):
+		with self.lock:
+			stages = {}
+			for stage, entry in self.stages.items():
+				stages[stage] = dict(entry, seconds=round(entry['seconds'], 3),
+				                     rows_per_second=round(entry['rows'] / entry['seconds'], 1) if entry['seconds'] else 0)
+
+			report = {
+					'started':      time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+					'seconds':      round(time.time() - self.started, 3),
+					'stages':       stages,
+					'skipped':      dict(self.skipped),
+					'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+			}
+
+		if self.trace_memory:
+			report['tracemalloc_peak'] = tracemalloc.get_traced_memory()[1]
+		return report
+
+	def write(self, path):
+		with open(path, 'w+') as fp:
+			json.dump(self.report(), fp, sort_keys=True, indent=4)
+
+	def log(self, prefix):
+		"""Emit every stage as a ``metrics`` log record, with the values in the record's ``metrics`` attribute"""
+		report = self.report()
+		for stage, entry in report['stages'].items():
+			name = '.'.join([prefix, stage])
+			metrics_logger.info("%s seconds=%s rows=%d queries=%d rows_per_second=%s", name, entry['seconds'],
+			                    entry['rows'], entry['queries'], entry['rows_per_second'],
+			                    extra={'metrics': dict(entry, name=name)})
+		for reason, count in report['skipped'].items():
+			metrics_logger.info("%s.skipped reason=%r count=%d", prefix, reason, count,
+			                    extra={'metrics': {'name': prefix + '.skipped', 'reason': reason, 'count': count}})
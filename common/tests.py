@@ -1,3 +1,92 @@
 #  Copyright (c) 2019 - 2019. Abhimanyu Saharan <desk.abhimanyu@gmail.com> and the Play.It contributors
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from area.models import City
+from artist.models import Artist
+from common.diff import row_hash
+from common.downloads import Manifest
+from common.pipeline import BoundedStage
+
 
 # Create your tests here.
+class BenchmarkTestCase(TestCase):
+	def test_benchmark_importers(self):
+		out = StringIO()
+		call_command('benchmark-importers', countries=2, regions=2, cities=50, artists=50, stdout=out)
+
+		lines = out.getvalue().splitlines()
+		self.assertListEqual([line.split()[0] for line in lines], ['continent', 'country', 'region', 'city', 'artist'])
+		self.assertFalse(City.objects.exists())
+		self.assertFalse(Artist.objects.exists())
+
+
+class ManifestTestCase(TestCase):
+	def test_same_size_change(self):
+		data_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, data_dir)
+		file_path = os.path.join(data_dir, 'dump.txt')
+
+		with open(file_path, 'w') as file_obj:
+			file_obj.write('old')
+		manifest = Manifest(data_dir)
+		manifest.record('dump.txt')
+		manifest.mark_imported('dump.txt')
+		self.assertTrue(manifest.is_imported('dump.txt'))
+
+		# Keep size and modification time, as a copy preserving timestamps would
+		stat = os.stat(file_path)
+		with open(file_path, 'w') as file_obj:
+			file_obj.write('new')
+		os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+		self.assertTrue(manifest.is_current('dump.txt'))
+		self.assertFalse(manifest.is_imported('dump.txt'))
+
+		manifest.mark_imported('dump.txt')
+		self.assertTrue(manifest.is_imported('dump.txt'))
+
+	def test_rows_changed(self):
+		data_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, data_dir)
+
+		with open(os.path.join(data_dir, 'dump.txt'), 'w') as file_obj:
+			file_obj.write('1\n2\n')
+		manifest = Manifest(data_dir)
+		manifest.record('dump.txt')
+		manifest.mark_imported('dump.txt', rows=2)
+		self.assertTrue(manifest.is_imported('dump.txt', rows=2))
+		# The table was emptied behind the importer's back
+		self.assertFalse(manifest.is_imported('dump.txt', rows=0))
+
+
+class RowHashTestCase(TestCase):
+	def test_stable_across_processes(self):
+		values = ['São Paulo', 12, 3.0, None, ['b', 'a']]
+		output = subprocess.check_output([sys.executable, '-c', 'from common.diff import row_hash; '
+		                                                        'print(row_hash(%r).hex())' % values],
+		                                 env=dict(os.environ, PYTHONHASHSEED='1'), cwd=os.getcwd())
+		self.assertEqual(output.decode().strip(), row_hash(values).hex())
+		self.assertEqual(row_hash(values), row_hash(['São Paulo', 12, 3, None, ['a', 'b']]))
+
+
+class BoundedStageTestCase(TestCase):
+	def test_order(self):
+		stage = BoundedStage('numbers', iter(range(100)), maxsize=2)
+		self.assertListEqual(list(stage), list(range(100)))
+		self.assertEqual(stage.report()['items'], 100)
+		self.assertLessEqual(stage.report()['max_queue_depth'], 2)
+
+	def test_error(self):
+		def numbers():
+			yield 1
+			raise ValueError()
+
+		with self.assertRaises(ValueError):
+			list(BoundedStage('numbers', numbers()))
@@ -24,6 +24,8 @@ urlpatterns = [
 	path('admin/', admin.site.urls),
 	path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
 	path('health/', include('health.urls', namespace='health-check')),
+	path('area/', include('area.urls', namespace='area')),
+	path('artist/', include('artist.urls', namespace='artist')),
 ]
 
 if settings.DEBUG: